@@ -0,0 +1,102 @@
+"""denormalize book ratings
+
+Revision ID: e91d9b70af7f
+Revises: f58eaeae27c7
+Create Date: 2026-10-18 10:00:12.408113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e91d9b70af7f'
+down_revision: Union[str, Sequence[str], None] = 'f58eaeae27c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Агрегаты пересчитываются одним UPDATE на оператор, а не на строку:
+# так bulk-вставки и каскадные удаления отзывов не бьют по строке книги N раз.
+APPLY_REVIEW_DELTA = """
+CREATE OR REPLACE FUNCTION books_apply_review_delta() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE books b
+        SET rating_sum = b.rating_sum + d.rate_sum, reviews_count = b.reviews_count + d.cnt
+        FROM (
+            SELECT book_id, sum(rate) AS rate_sum, count(*) AS cnt
+            FROM new_reviews GROUP BY book_id
+        ) d
+        WHERE b.id = d.book_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE books b
+        SET rating_sum = b.rating_sum - d.rate_sum, reviews_count = b.reviews_count - d.cnt
+        FROM (
+            SELECT book_id, sum(rate) AS rate_sum, count(*) AS cnt
+            FROM old_reviews GROUP BY book_id
+        ) d
+        WHERE b.id = d.book_id;
+    ELSE
+        UPDATE books b
+        SET rating_sum = b.rating_sum + d.rate_sum, reviews_count = b.reviews_count + d.cnt
+        FROM (
+            SELECT book_id, sum(rate) AS rate_sum, sum(cnt) AS cnt
+            FROM (
+                SELECT book_id, rate, 1 AS cnt FROM new_reviews
+                UNION ALL
+                SELECT book_id, -rate, -1 FROM old_reviews
+            ) t
+            GROUP BY book_id
+        ) d
+        WHERE b.id = d.book_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('rating_sum', sa.Float(), server_default='0', nullable=False))
+    op.add_column('books', sa.Column('reviews_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(APPLY_REVIEW_DELTA)
+    op.execute(
+        "CREATE TRIGGER reviews_after_insert AFTER INSERT ON reviews "
+        "REFERENCING NEW TABLE AS new_reviews "
+        "FOR EACH STATEMENT EXECUTE FUNCTION books_apply_review_delta()"
+    )
+    op.execute(
+        "CREATE TRIGGER reviews_after_delete AFTER DELETE ON reviews "
+        "REFERENCING OLD TABLE AS old_reviews "
+        "FOR EACH STATEMENT EXECUTE FUNCTION books_apply_review_delta()"
+    )
+    op.execute(
+        "CREATE TRIGGER reviews_after_update AFTER UPDATE ON reviews "
+        "REFERENCING OLD TABLE AS old_reviews NEW TABLE AS new_reviews "
+        "FOR EACH STATEMENT EXECUTE FUNCTION books_apply_review_delta()"
+    )
+    op.execute(
+        """
+        UPDATE books b
+        SET rating_sum = r.rate_sum, reviews_count = r.cnt
+        FROM (
+            SELECT book_id, sum(rate) AS rate_sum, count(*) AS cnt
+            FROM reviews GROUP BY book_id
+        ) r
+        WHERE b.id = r.book_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS reviews_after_update ON reviews")
+    op.execute("DROP TRIGGER IF EXISTS reviews_after_delete ON reviews")
+    op.execute("DROP TRIGGER IF EXISTS reviews_after_insert ON reviews")
+    op.execute("DROP FUNCTION IF EXISTS books_apply_review_delta()")
+    op.drop_column('books', 'reviews_count')
+    op.drop_column('books', 'rating_sum')
@@ -0,0 +1,35 @@
+"""books trigram indexes
+
+Revision ID: 3c8f1a2d7b64
+Revises: e91d9b70af7f
+Create Date: 2026-10-18 10:30:41.215907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c8f1a2d7b64'
+down_revision: Union[str, Sequence[str], None] = 'e91d9b70af7f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'ix_books_title_trgm', 'books', [sa.text('lower(title) gin_trgm_ops')], postgresql_using='gin'
+    )
+    op.create_index(
+        'ix_books_author_trgm', 'books', [sa.text('lower(author) gin_trgm_ops')], postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_author_trgm', table_name='books')
+    op.drop_index('ix_books_title_trgm', table_name='books')
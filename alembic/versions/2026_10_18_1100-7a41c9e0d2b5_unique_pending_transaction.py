@@ -0,0 +1,47 @@
+"""unique pending transaction
+
+Revision ID: 7a41c9e0d2b5
+Revises: 3c8f1a2d7b64
+Create Date: 2026-10-18 11:00:07.531244
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a41c9e0d2b5'
+down_revision: Union[str, Sequence[str], None] = '3c8f1a2d7b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # дубли могли появиться из-за гонки в старой проверке, оставляем самую раннюю
+    op.execute(
+        """
+        UPDATE transactions t SET status = 'EXPIRED'
+        WHERE t.status = 'PENDING' AND EXISTS (
+            SELECT 1 FROM transactions o
+            WHERE o.status = 'PENDING'
+              AND o.shop_item_id = t.shop_item_id
+              AND o.user_id = t.user_id
+              AND o.id < t.id
+        )
+        """
+    )
+    op.create_index(
+        'uq_transactions_pending_item_user',
+        'transactions',
+        ['shop_item_id', 'user_id'],
+        unique=True,
+        postgresql_where=sa.text("status = 'PENDING'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_transactions_pending_item_user', table_name='transactions')
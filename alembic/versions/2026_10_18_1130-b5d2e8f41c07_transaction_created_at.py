@@ -0,0 +1,38 @@
+"""transaction created_at
+
+Revision ID: b5d2e8f41c07
+Revises: 7a41c9e0d2b5
+Create Date: 2026-10-18 11:30:54.118302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d2e8f41c07'
+down_revision: Union[str, Sequence[str], None] = '7a41c9e0d2b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'transactions',
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    )
+    op.create_index(
+        'ix_transactions_pending_created_at',
+        'transactions',
+        ['created_at'],
+        postgresql_where=sa.text("status = 'PENDING'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_pending_created_at', table_name='transactions')
+    op.drop_column('transactions', 'created_at')
@@ -0,0 +1,72 @@
+"""catalog versions
+
+Revision ID: d2f7a3c91e58
+Revises: b5d2e8f41c07
+Create Date: 2026-10-18 12:00:37.561904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f7a3c91e58'
+down_revision: Union[str, Sequence[str], None] = 'b5d2e8f41c07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# та же функция, что в denormalize_book_ratings; {bump} поднимает версию книги
+APPLY_REVIEW_DELTA = """
+CREATE OR REPLACE FUNCTION books_apply_review_delta() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE books b
+        SET rating_sum = b.rating_sum + d.rate_sum, reviews_count = b.reviews_count + d.cnt{bump}
+        FROM (
+            SELECT book_id, sum(rate) AS rate_sum, count(*) AS cnt
+            FROM new_reviews GROUP BY book_id
+        ) d
+        WHERE b.id = d.book_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE books b
+        SET rating_sum = b.rating_sum - d.rate_sum, reviews_count = b.reviews_count - d.cnt{bump}
+        FROM (
+            SELECT book_id, sum(rate) AS rate_sum, count(*) AS cnt
+            FROM old_reviews GROUP BY book_id
+        ) d
+        WHERE b.id = d.book_id;
+    ELSE
+        UPDATE books b
+        SET rating_sum = b.rating_sum + d.rate_sum, reviews_count = b.reviews_count + d.cnt{bump}
+        FROM (
+            SELECT book_id, sum(rate) AS rate_sum, sum(cnt) AS cnt
+            FROM (
+                SELECT book_id, rate, 1 AS cnt FROM new_reviews
+                UNION ALL
+                SELECT book_id, -rate, -1 FROM old_reviews
+            ) t
+            GROUP BY book_id
+        ) d
+        WHERE b.id = d.book_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('shop_books', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.execute(APPLY_REVIEW_DELTA.format(bump=", version = b.version + 1"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(APPLY_REVIEW_DELTA.format(bump=""))
+    op.drop_column('shop_books', 'version')
+    op.drop_column('books', 'version')
@@ -0,0 +1,29 @@
+"""reviews pagination indexes
+
+Revision ID: 8e4b6c2a9f13
+Revises: d2f7a3c91e58
+Create Date: 2026-10-18 12:30:12.804316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4b6c2a9f13'
+down_revision: Union[str, Sequence[str], None] = 'd2f7a3c91e58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_reviews_book_id_id', 'reviews', ['book_id', 'id'])
+    op.create_index('ix_reviews_book_id_rate_id', 'reviews', ['book_id', 'rate', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reviews_book_id_rate_id', table_name='reviews')
+    op.drop_index('ix_reviews_book_id_id', table_name='reviews')
@@ -1,6 +1,9 @@
 from app.api.routes.books import router as books_router
 from app.api.routes.users import router as users_router
 from app.api.routes.shop import router as shop_router
+from app.api.routes.export import router as export_router
+from app.api.routes.admin import router as admin_router
+from app.api.routes.metrics import router as metrics_router
 
 
-__all__ = ["books_router", "users_router", "shop_router"]
\ No newline at end of file
+__all__ = ["books_router", "users_router", "shop_router", "export_router", "admin_router", "metrics_router"]
\ No newline at end of file
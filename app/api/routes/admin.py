@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+from app.core.dependencies import require_admin
+from app.database.database import engine, replica_engines
+from app.database.pool import pool_status
+
+router = APIRouter(prefix="/admin")
+admin_tag = ["Администрирование"]
+
+
+@router.get("/db/pool", tags=admin_tag, name="Состояние пула соединений с БД")
+async def get_db_pool_status(_: None = Depends(require_admin)) -> dict:
+    status = pool_status(engine.pool)
+    if replica_engines:
+        status["replicas"] = [pool_status(replica.pool) for replica in replica_engines]
+    return status
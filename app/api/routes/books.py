@@ -1,25 +1,46 @@
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, Query, Request, Response
 from app.core.dependencies import require_admin
-from app.models.user import User
-from app.schemas.pagination import PaginatedParams, PaginatedResponse
-from app.schemas.review import ReviewResponse, ReviewCreate
-from app.services.books import BooksService, get_books_service
+from app.schemas.auth import Principal
+from app.schemas.pagination import PaginatedParams, PaginatedResponse, SearchParams
+from app.schemas.review import ReviewParams, ReviewResponse, ReviewCreate
+from app.schemas.batch import BatchParams, BatchResponse
+from app.schemas.catalog_import import ImportReport
+from app.services.books import BooksService, get_books_service, get_books_read_service
+from app.services.catalog_import import CatalogImportService, ImportFormat, get_catalog_import_service
 from app.schemas.book import BookResponse, BookCreate, BookUpdate
 from app.core.dependencies import get_current_user
-from fastapi_cache.decorator import cache
+from app.core.cache import BOOK_REVIEWS_NAMESPACE, BOOKS_LIST_TAG, cached, book_version_key, count_book_hit
+from app.core.etag import etag_matches, make_etag, not_modified, tag_etag
+from app.core.responses import OrjsonResponse, RawJSONResponse, paginated_response
+from app.utils.utils import cached_json
 
 router = APIRouter(prefix="/books")
 books_tag = ["Книги"]
 reviews_tag = ["Отзывы"]
 
 
-@router.get("/", tags=books_tag, name="Получить все книги")
-@cache(expire=60)
+@cached(namespace=BOOKS_LIST_TAG)
+async def books_page(
+    params: PaginatedParams, service: BooksService, request: Request | None = None
+) -> OrjsonResponse:
+    return paginated_response(await service.get_all_books(params))
+
+
+@router.get(
+    "/", tags=books_tag, name="Получить все книги", response_model=PaginatedResponse[BookResponse]
+)
 async def get_books(
+    request: Request,
     params: PaginatedParams = Depends(),
-    service: BooksService = Depends(get_books_service),
-) -> PaginatedResponse:
-    return await service.get_all_books(params.page, params.page_size)
+    service: BooksService = Depends(get_books_read_service),
+) -> Response:
+    etag = await tag_etag(BOOKS_LIST_TAG)
+    if etag is not None and etag_matches(request, etag):
+        return not_modified(etag)
+    response = await books_page(request=request, params=params, service=service)
+    if etag is not None:
+        response.headers["ETag"] = etag
+    return response
 
 
 @router.post("/", tags=books_tag, name="Добавить книгу")
@@ -32,21 +53,54 @@ async def create_book(
     return BookResponse.model_validate(book)
 
 
-@router.get("/search", tags=books_tag, name="Поиск книги по названию или автору")
+@router.post("/import", tags=books_tag, name="Массовый импорт книг из NDJSON или CSV")
+async def import_books(
+    request: Request,
+    fmt: ImportFormat = Query("ndjson", alias="format"),
+    service: CatalogImportService = Depends(get_catalog_import_service),
+    _: None = Depends(require_admin),
+) -> ImportReport:
+    return await service.import_catalog(request.stream(), fmt)
+
+
+@router.get(
+    "/search",
+    tags=books_tag,
+    name="Поиск книги по названию или автору",
+    response_model=PaginatedResponse[BookResponse],
+)
 async def search_book_by_title_author(
-    query: str, service: BooksService = Depends(get_books_service)
-) -> list[BookResponse]:
-    books = await service.search_books(query)
-    return [BookResponse.model_validate(book) for book in books]
+    params: SearchParams = Depends(),
+    service: BooksService = Depends(get_books_read_service),
+) -> OrjsonResponse:
+    return paginated_response(await service.search_books(params))
+
+
+@router.get("/batch", tags=books_tag, name="Получить несколько книг по id")
+async def get_books_batch(
+    params: BatchParams = Depends(),
+    service: BooksService = Depends(get_books_read_service),
+) -> BatchResponse[BookResponse]:
+    return await service.get_books_batch(params.id_list)
 
 
-@router.get("/{book_id}", tags=books_tag, name="Получить книгу из базы данных")
-@cache(expire=60)
+@router.get(
+    "/{book_id}", tags=books_tag, name="Получить книгу из базы данных", response_model=BookResponse
+)
 async def get_book(
-    book_id: int, service: BooksService = Depends(get_books_service)
-) -> BookResponse:
-    book = await service.get_book_by_id(book_id)
-    return BookResponse.model_validate(book)
+    book_id: int, request: Request, service: BooksService = Depends(get_books_read_service)
+) -> Response:
+    version = await service.get_book_version(book_id)
+    count_book_hit(book_id)
+    etag = make_etag("book", book_id, version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    async def load() -> dict:
+        return BooksService.book_row_dict(await service.get_book_by_id(book_id))
+
+    body = await cached_json(lambda prefix: book_version_key(prefix, book_id, version), load)
+    return RawJSONResponse(body, headers={"ETag": etag})
 
 
 @router.delete("/{book_id}", tags=books_tag, name="Удалить книгу из базы")
@@ -63,26 +117,45 @@ async def delete_book(
 async def update_book(
     book_id: int,
     body: BookUpdate,
+    response: Response,
     service: BooksService = Depends(get_books_service),
     _: None = Depends(require_admin),
 ) -> BookResponse:
     updated_book = await service.update_book(book_id, body)
+    response.headers["ETag"] = make_etag("book", book_id, updated_book.version)
     return BookResponse.model_validate(updated_book)
 
 
-@router.get("/{book_id}/reviews", tags=reviews_tag, name="Получить отзывы по книге")
+@cached(namespace=BOOK_REVIEWS_NAMESPACE)
+async def reviews_page(
+    book_id: int, params: ReviewParams, service: BooksService, request: Request | None = None
+) -> OrjsonResponse:
+    return paginated_response(await service.get_reviews_by_book_id(book_id, params))
+
+
+@router.get(
+    "/{book_id}/reviews",
+    tags=reviews_tag,
+    name="Получить отзывы по книге",
+    response_model=PaginatedResponse[ReviewResponse],
+)
 async def get_reviews(
-    book_id: int, service: BooksService = Depends(get_books_service)
-) -> list[ReviewResponse]:
-    reviews = await service.get_reviews_by_book_id(book_id)
-    return [ReviewResponse.model_validate(review) for review in reviews]
+    book_id: int,
+    request: Request,
+    params: ReviewParams = Depends(),
+    service: BooksService = Depends(get_books_read_service),
+) -> Response:
+    # кэшируется только первая страница: дальше листают курсором, и ключи не повторяются
+    if params.cursor is None and params.page == 1:
+        return await reviews_page(request=request, book_id=book_id, params=params, service=service)
+    return paginated_response(await service.get_reviews_by_book_id(book_id, params))
 
 
 @router.post("/{book_id}/reviews", tags=reviews_tag, name="Добавить отзыв по книге")
 async def add_review(
     book_id: int,
     body: ReviewCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     service: BooksService = Depends(get_books_service),
 ) -> ReviewResponse:
     new_review = await service.create_book_review(book_id, body, current_user.id)
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from app.core.dependencies import require_admin
+from app.services.catalog_export import CatalogExportService, ExportFormat, get_catalog_export_service
+
+router = APIRouter(prefix="/export")
+export_tag = ["Выгрузка"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def export_response(body, fmt: ExportFormat, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+@router.get("/books", tags=export_tag, name="Выгрузка всех книг")
+async def export_books(
+    fmt: ExportFormat = Query("ndjson", alias="format"),
+    since_id: int = Query(0, ge=0),
+    service: CatalogExportService = Depends(get_catalog_export_service),
+    _: None = Depends(require_admin),
+) -> StreamingResponse:
+    return export_response(service.export_books(fmt, since_id), fmt, "books")
+
+
+@router.get("/shop/items", tags=export_tag, name="Выгрузка товаров магазина")
+async def export_shop_items(
+    fmt: ExportFormat = Query("ndjson", alias="format"),
+    since_id: int = Query(0, ge=0),
+    service: CatalogExportService = Depends(get_catalog_export_service),
+    _: None = Depends(require_admin),
+) -> StreamingResponse:
+    return export_response(service.export_shop_items(fmt, since_id), fmt, "shop_items")
+
+
+@router.get("/reviews", tags=export_tag, name="Выгрузка отзывов")
+async def export_reviews(
+    fmt: ExportFormat = Query("ndjson", alias="format"),
+    since_id: int = Query(0, ge=0),
+    service: CatalogExportService = Depends(get_catalog_export_service),
+    _: None = Depends(require_admin),
+) -> StreamingResponse:
+    return export_response(service.export_reviews(fmt, since_id), fmt, "reviews")
@@ -0,0 +1,71 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.cache import get_cache_backend
+from app.core.metrics import MetricsWriter, write_request_metrics
+from app.database.database import engine, replica_engines
+from app.utils.utils import password_hash_stats
+
+router = APIRouter()
+
+
+def write_pool_metrics(writer: MetricsWriter) -> None:
+    pools = [("primary", engine.pool)]
+    pools += [(f"replica{number}", replica.pool) for number, replica in enumerate(replica_engines)]
+
+    writer.metric("db_pool_connections", "gauge", "Соединения пула по состоянию")
+    for name, pool in pools:
+        writer.sample("db_pool_connections", pool.checkedout(), db=name, state="checked_out")
+        writer.sample("db_pool_connections", pool.checkedin(), db=name, state="idle")
+        writer.sample("db_pool_connections", max(pool.overflow(), 0), db=name, state="overflow")
+
+    writer.metric("db_pool_checkout_failures_total", "counter", "Таймауты ожидания соединения")
+    for name, pool in pools:
+        writer.sample("db_pool_checkout_failures_total", pool.metrics.checkout_failures, db=name)
+
+    writer.metric("db_pool_wait_seconds_total", "counter", "Суммарное ожидание соединения из пула")
+    for name, pool in pools:
+        writer.sample("db_pool_wait_seconds_total", pool.metrics.wait_seconds_total, db=name)
+
+
+CACHE_STAT_LABELS = {
+    "l1_hits": ("l1", "hit"),
+    "l1_misses": ("l1", "miss"),
+    "l2_hits": ("l2", "hit"),
+    "l2_misses": ("l2", "miss"),
+}
+
+
+def write_cache_metrics(writer: MetricsWriter) -> None:
+    backend = get_cache_backend()
+    if backend is None:
+        return
+    writer.metric("cache_requests_total", "counter", "Обращения к кэшу по уровням и результату")
+    for name, count in backend.stats.items():
+        tier, result = CACHE_STAT_LABELS[name]
+        writer.sample("cache_requests_total", count, tier=tier, result=result)
+    writer.metric("cache_stampede_events_total", "counter", "Склеенные промахи, ожидания блокировки и устаревшие ответы")
+    for event, count in backend.stampede_stats.items():
+        writer.sample("cache_stampede_events_total", count, event=event)
+    writer.metric("cache_l1_entries", "gauge", "Записей в локальном L1-кэше")
+    writer.sample("cache_l1_entries", len(backend.l1))
+
+
+def write_password_hash_metrics(writer: MetricsWriter) -> None:
+    writer.metric("password_hash_calls_total", "counter", "Вызовы bcrypt в пуле")
+    writer.sample("password_hash_calls_total", password_hash_stats["calls"])
+    writer.metric("password_hash_in_flight", "gauge", "Вызовы bcrypt в очереди и в работе")
+    writer.sample("password_hash_in_flight", password_hash_stats["in_flight"])
+    writer.metric("password_hash_queue_seconds_total", "counter", "Ожидание свободного воркера bcrypt")
+    writer.sample("password_hash_queue_seconds_total", password_hash_stats["queue_seconds_total"])
+    writer.metric("password_hash_run_seconds_total", "counter", "Время работы bcrypt")
+    writer.sample("password_hash_run_seconds_total", password_hash_stats["run_seconds_total"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    writer = MetricsWriter()
+    write_request_metrics(writer)
+    write_pool_metrics(writer)
+    write_cache_metrics(writer)
+    write_password_hash_metrics(writer)
+    return PlainTextResponse(writer.render(), media_type="text/plain; version=0.0.4")
@@ -1,23 +1,47 @@
-from fastapi import APIRouter, Depends, Response
-from app.core.dependencies import require_admin, get_current_user
-from app.models import User
+from fastapi import APIRouter, Depends, Request, Response
+from app.core.dependencies import require_admin, get_current_user, require_payment_provider
+from app.schemas.auth import Principal
+from app.schemas.batch import BatchParams, BatchResponse
 from app.schemas.pagination import PaginatedParams, PaginatedResponse
 from app.schemas.shop import ShopItemCreate, ShopItemResponse, ShopItemUpdate
 from app.schemas.transaction import TransactionResponse
-from app.services.shop import ShopService, get_shop_items_service
-from fastapi_cache.decorator import cache
+from app.services.shop import ShopService, get_shop_items_service, get_shop_items_read_service
+from app.core.cache import SHOP_LIST_TAG, cached
+from app.core.etag import etag_matches, make_etag, not_modified, tag_etag
+from app.core.responses import OrjsonResponse, paginated_response
 
 router = APIRouter(prefix="/shop")
 shop_tag = ["Магазин"]
 
 
-@router.get("/items", tags=shop_tag)
-@cache(expire=60)
+@cached(namespace=SHOP_LIST_TAG)
+async def items_page(
+    params: PaginatedParams, service: ShopService, request: Request | None = None
+) -> OrjsonResponse:
+    return paginated_response(await service.get_shop_items(params))
+
+
+@router.get("/items", tags=shop_tag, response_model=PaginatedResponse[ShopItemResponse])
 async def get_items(
+    request: Request,
     params: PaginatedParams = Depends(),
-    service: ShopService = Depends(get_shop_items_service),
-) -> PaginatedResponse:
-    return await service.get_shop_items(params)
+    service: ShopService = Depends(get_shop_items_read_service),
+) -> Response:
+    # версия тега растёт при каждом изменении остатков: резерв, просрочка, правка товара
+    etag = await tag_etag(SHOP_LIST_TAG)
+    if etag is not None and etag_matches(request, etag):
+        return not_modified(etag)
+    response = await items_page(request=request, params=params, service=service)
+    if etag is not None:
+        response.headers["ETag"] = etag
+    return response
+
+@router.get("/items/batch", tags=shop_tag)
+async def get_items_batch(
+    params: BatchParams = Depends(),
+    service: ShopService = Depends(get_shop_items_read_service),
+) -> BatchResponse[ShopItemResponse]:
+    return await service.get_shop_items_batch(params.id_list)
 
 @router.post("/items", tags=shop_tag)
 async def create_item(
@@ -43,23 +67,33 @@ async def delete_item(
 async def update_item(
     item_id: int,
     item: ShopItemUpdate,
+    response: Response,
     service: ShopService = Depends(get_shop_items_service),
     _: None = Depends(require_admin),
 ) -> ShopItemResponse:
     updated_item = await service.update_shop_item(item_id, item)
+    response.headers["ETag"] = make_etag("shop-item", item_id, updated_item.version)
     return ShopItemResponse.model_validate(updated_item)
 
 @router.post("/items/{item_id}/purchase", tags=shop_tag)
 async def purchase_item(
     item_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     service: ShopService = Depends(get_shop_items_service),
 ) -> dict:
     return await service.create_item_purchase(item_id, current_user.id)
 
+@router.post("/pay/{idempotence_key}", tags=shop_tag)
+async def confirm_payment(
+    idempotence_key: str,
+    service: ShopService = Depends(get_shop_items_service),
+    _: None = Depends(require_payment_provider),
+) -> TransactionResponse:
+    return await service.confirm_payment(idempotence_key)
+
 @router.get("/transactions/{transaction_id}", tags=shop_tag)
 async def get_transaction(
-    transaction_id: int, service: ShopService = Depends(get_shop_items_service),
+    transaction_id: int, service: ShopService = Depends(get_shop_items_read_service),
     _: None = Depends(require_admin),
 ) -> TransactionResponse:
     return await service.get_transaction_by_id(transaction_id)
\ No newline at end of file
@@ -2,9 +2,10 @@ from fastapi.security import OAuth2PasswordRequestForm
 from fastapi import APIRouter, Depends, Response, Request, HTTPException
 from app.core.dependencies import require_admin
 from app.schemas.auth import UserTokens, RefreshTokenRequest
-from app.services.users import UserService, get_users_service
+from app.services.users import UserService, get_users_service, get_users_read_service
 from app.schemas.user import UserRegister, UserResponse, UserCredentials
-from fastapi_cache.decorator import cache
+from app.core.cache import USERS_LIST_TAG, CacheKeyBuilder, cached
+from app.models.user import UserRole
 
 router = APIRouter(prefix="/users")
 users_tag = ["Пользователи"]
@@ -13,10 +14,10 @@ users_tag = ["Пользователи"]
 @router.get(
     "/", tags=users_tag, name="Получить информацию о зарегистрированных пользователях"
 )
-@cache(expire=60)
+@cached(namespace=USERS_LIST_TAG, key_builder=CacheKeyBuilder(vary=("role",)))
 async def get_users(
-    service: UserService = Depends(get_users_service),
-    _: None = Depends(require_admin),
+    service: UserService = Depends(get_users_read_service),
+    role: UserRole = Depends(require_admin),
 ) -> list[UserResponse]:
     users = await service.get_all_users()
     return [UserResponse.model_validate(user) for user in users]
@@ -24,7 +25,7 @@ async def get_users(
 
 @router.get("/{user_id}/", tags=users_tag, name="Получить информацию по user_id")
 async def get_user(
-    user_id: int, service: UserService = Depends(get_users_service)
+    user_id: int, service: UserService = Depends(get_users_read_service)
 ) -> UserResponse:
     user = await service.get_user_by_id(user_id)
     return UserResponse.model_validate(user)
@@ -36,7 +37,7 @@ async def register_user(
     user: UserRegister, service: UserService = Depends(get_users_service)
 ) -> UserResponse:
     new_user = await service.register_new_user(user)
-    tokens = await service.login_exist_user(UserCredentials(username=user.username, password=user.password))
+    tokens = service.issue_tokens(new_user)
     response.set_cookie("access_token", tokens.access_token)
     response.set_cookie("refresh_token", tokens.refresh_token)
     return UserResponse.model_validate(new_user)
@@ -70,6 +71,6 @@ async def refresh_access_tkn(
     refresh_token = request.cookies.get("refresh_token")
     if refresh_token is None:
         raise HTTPException(status_code=401, detail="Refresh токен не найден")
-    tokens = service.refresh_access_token(RefreshTokenRequest(refresh_token=refresh_token))
+    tokens = await service.refresh_access_token(RefreshTokenRequest(refresh_token=refresh_token))
     response.set_cookie(key="access_token", value=tokens.access_token, httponly=True, samesite="lax")
     return tokens
\ No newline at end of file
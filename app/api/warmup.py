@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import time
+from app.api.routes.books import books_page
+from app.api.routes.shop import items_page
+from app.core.cache import book_tag, book_version_key, get_cache_backend, top_book_ids
+from app.core.responses import dump_json
+from app.core.settings import settings
+from app.database.database import read_session_fabric
+from app.schemas.pagination import ALLOWED_PAGE_SIZES, PaginatedParams
+from app.services.books import BooksService
+from app.services.exceptions import NotFoundError
+from app.services.shop import ShopService
+
+logger = logging.getLogger(__name__)
+
+WARMUP_BOOKS_CHUNK = 100
+
+warmup_state = {"ready": False, "timed_out": False, "pages": 0, "books": 0, "failed": 0, "seconds": None}
+
+
+async def _warm_page(semaphore: asyncio.Semaphore, page_helper, service_cls, params: PaginatedParams) -> None:
+    async with semaphore:
+        try:
+            # тот же кэшируемый хелпер, что и в роуте, — ключ совпадёт с ключом запроса
+            async with read_session_fabric()() as session:
+                await page_helper(params=params, service=service_cls(session))
+            warmup_state["pages"] += 1
+        except NotFoundError:
+            pass
+        except Exception:
+            warmup_state["failed"] += 1
+            logger.warning("Не удалось прогреть %s %s", page_helper.__name__, params, exc_info=True)
+
+
+async def _warm_books(semaphore: asyncio.Semaphore, ids: list[int]) -> None:
+    backend = get_cache_backend()
+    async with semaphore:
+        try:
+            async with read_session_fabric()() as session:
+                books = await BooksService(session).get_books_by_ids(ids)
+            # тело и ключ как у get_book: версия в ключе, JSON из book_row_dict
+            await backend.set_many(
+                [
+                    (
+                        book_version_key(backend.prefix, book.id, book.version),
+                        dump_json(BooksService.book_row_dict(book)),
+                        [book_tag(book.id)],
+                    )
+                    for book in books
+                ],
+                settings.CACHE_TTL,
+            )
+            warmup_state["books"] += len(books)
+        except Exception:
+            warmup_state["failed"] += 1
+            logger.warning("Не удалось прогреть книги %s…", ids[:5], exc_info=True)
+
+
+async def _warm_up(semaphore: asyncio.Semaphore) -> None:
+    jobs = [
+        _warm_page(semaphore, page_helper, service_cls, PaginatedParams(page=page, page_size=page_size))
+        for page in range(1, settings.CACHE_WARMUP_PAGES + 1)
+        for page_size in ALLOWED_PAGE_SIZES
+        for page_helper, service_cls in ((books_page, BooksService), (items_page, ShopService))
+    ]
+    try:
+        ids = await top_book_ids(settings.CACHE_WARMUP_TOP_BOOKS)
+    except Exception:
+        logger.warning("Не удалось получить самые запрашиваемые книги", exc_info=True)
+        ids = []
+    jobs += [
+        _warm_books(semaphore, ids[i:i + WARMUP_BOOKS_CHUNK]) for i in range(0, len(ids), WARMUP_BOOKS_CHUNK)
+    ]
+    await asyncio.gather(*jobs)
+
+
+async def warm_up_cache() -> None:
+    """Прогревает кэш после старта и только потом помечает инстанс готовым (/ready)."""
+    started = time.monotonic()
+    if settings.CACHE_WARMUP_ENABLED and get_cache_backend() is not None:
+        semaphore = asyncio.Semaphore(settings.CACHE_WARMUP_CONCURRENCY)
+        try:
+            async with asyncio.timeout(settings.CACHE_WARMUP_TIMEOUT):
+                await _warm_up(semaphore)
+        except TimeoutError:
+            warmup_state["timed_out"] = True
+            logger.warning("Прогрев кэша не уложился в %s с", settings.CACHE_WARMUP_TIMEOUT)
+    warmup_state["seconds"] = round(time.monotonic() - started, 3)
+    warmup_state["ready"] = True
+    logger.info("Прогрев кэша завершён: %s", warmup_state)
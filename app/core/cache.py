@@ -1,30 +1,743 @@
+import asyncio
 import hashlib
+import json
+import logging
 import os
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+import orjson
 from fastapi import Request, Response
 from fastapi_cache import FastAPICache
+from fastapi_cache.coder import JsonCoder
 from fastapi_cache.backends.redis import RedisBackend
+from pydantic import BaseModel
 from redis import asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.metrics import observe_cache
+from app.core.responses import RawJSONResponse, dump_json
+from app.core.settings import settings
+from app.database.repository import BaseRepository
+
+logger = logging.getLogger(__name__)
+
+BOOKS_LIST_TAG = "books:list"
+SHOP_LIST_TAG = "shop:list"
+USERS_LIST_TAG = "users:list"
+# версии держим только для списков: счётчик на каждую сущность копился бы без предела
+VERSIONED_TAGS = frozenset({BOOKS_LIST_TAG, SHOP_LIST_TAG, USERS_LIST_TAG})
+BOOK_REVIEWS_NAMESPACE = "book:{book_id}:reviews"
+
+# атомарно забирает ключи из tag-сетов, удаляет их вместе с сетами, ставит
+# метки инвалидации и поднимает версии тегов. KEYS: ARGV[2] tag-сетов, столько же
+# меток, затем счётчики версий — только для списочных тегов, по ним строится ETag.
+# ARGV[1] — стартовое значение счётчика, ARGV[3] — время жизни метки
+INVALIDATE_TAGS_LUA = """
+local keys = {}
+local tags = tonumber(ARGV[2])
+for i = 1, tags do
+    for _, key in ipairs(redis.call('SMEMBERS', KEYS[i])) do
+        table.insert(keys, key)
+    end
+    redis.call('DEL', KEYS[i])
+    redis.call('INCR', KEYS[tags + i])
+    redis.call('EXPIRE', KEYS[tags + i], ARGV[3])
+end
+for i = 2 * tags + 1, #KEYS do
+    redis.call('SET', KEYS[i], ARGV[1], 'NX')
+    redis.call('INCR', KEYS[i])
+end
+for i = 1, #keys, 500 do
+    redis.call('DEL', unpack(keys, i, math.min(i + 499, #keys)))
+end
+return keys
+"""
+
+# запись только если с начала загрузки ни один из тегов не инвалидировали:
+# иначе чтение, начатое до коммита, положило бы в кэш данные старше инвалидации.
+# KEYS: ключ, ARGV[3] меток, затем tag-сеты; ARGV: значение, TTL (0 — без TTL),
+# число меток и значения меток, прочитанные до загрузки ('' — метки не было)
+SET_IF_NOT_INVALIDATED_LUA = """
+local marks = tonumber(ARGV[3])
+for i = 1, marks do
+    local current = redis.call('GET', KEYS[1 + i]) or ''
+    if current ~= ARGV[3 + i] then
+        return 0
+    end
+end
+local ttl = tonumber(ARGV[2])
+if ttl > 0 then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ttl)
+else
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+for i = marks + 2, #KEYS do
+    redis.call('SADD', KEYS[i], KEYS[1])
+    if ttl > 0 then
+        redis.call('EXPIRE', KEYS[i], ttl, 'NX')
+        redis.call('EXPIRE', KEYS[i], ttl, 'GT')
+    end
+end
+return 1
+"""
+
+# дольше этого загрузка из базы не длится; метки не копятся дольше
+INVALIDATION_MARK_SECONDS = 300
+
+# снимает блокировку, только если она всё ещё наша, а не перехвачена после истечения
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def book_tag(book_id: int) -> str:
+    return f"book:{book_id}"
+
+
+def book_reviews_tag(book_id: int) -> str:
+    return BOOK_REVIEWS_NAMESPACE.format(book_id=book_id)
+
+
+def book_entity_key(prefix: str, book_id: int) -> str:
+    return f"{prefix}:{book_tag(book_id)}:entity"
+
+
+def book_hits_key(prefix: str) -> str:
+    return f"{prefix}:hits:books"
+
+
+def book_version_key(prefix: str, book_id: int, version: int) -> str:
+    # версия в ключе: тело в кэше всегда соответствует своему ETag
+    return f"{prefix}:{book_tag(book_id)}:v{version}"
+
+
+def shop_item_entity_key(prefix: str, item_id: int) -> str:
+    return f"{prefix}:shop:item:{item_id}:entity"
+
+
+class RawJSONCoder(JsonCoder):
+    """Кэширует готовый JSON и на попадании отдаёт байты как есть: без json.loads
+    и повторной валидации ответа по response_model."""
+
+    @classmethod
+    def encode(cls, value) -> bytes:
+        if isinstance(value, Response):
+            return value.body
+        return dump_json(value)
+
+    @classmethod
+    def decode_as_type(cls, value: bytes, *, type_=None) -> Response:
+        return RawJSONResponse(value)
+
+
+class LRUCache:
+    """Ограниченный по размеру и TTL in-process кэш (L1)."""
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # (когда вытеснить из L1, когда истекает сама запись, значение)
+        self._data: OrderedDict[str, tuple[float, float | None, bytes]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_with_ttl(self, key: str) -> tuple[int, bytes | None]:
+        # TTL — остаток жизни записи в L2, а не в L1: по нему судят об устаревании
+        entry = self._data.get(key)
+        if entry is None:
+            return 0, None
+        evict_at, expires_at, value = entry
+        now = time.monotonic()
+        if evict_at <= now:
+            self._data.pop(key, None)
+            return 0, None
+        self._data.move_to_end(key)
+        if expires_at is None:
+            return -1, value
+        return int(expires_at - now) + 1, value
+
+    def set(self, key: str, value: bytes, ttl: int | None = None) -> None:
+        now = time.monotonic()
+        expires_at = now + ttl if ttl and ttl > 0 else None
+        evict_at = min(now + self.ttl, expires_at) if expires_at is not None else now + self.ttl
+        self._data[key] = (evict_at, expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self, namespace: str | None = None) -> None:
+        if namespace is None:
+            self._data.clear()
+            return
+        for key in [k for k in self._data if k.startswith(f"{namespace}:")]:
+            del self._data[key]
+
+
+class TwoTierBackend(RedisBackend):
+    """L1 в памяти процесса перед Redis (L2).
+
+    Инвалидация рассылается через Redis pub/sub, чтобы остальные воркеры
+    сбросили свои копии в L1.
+    """
+
+    def __init__(self, redis: aioredis.Redis, l1: LRUCache, prefix: str):
+        super().__init__(redis)
+        self.l1 = l1
+        self.prefix = prefix
+        self.channel = f"{prefix}:invalidate"
+        self._invalidate_tags = redis.register_script(INVALIDATE_TAGS_LUA)
+        self._release_lock = redis.register_script(RELEASE_LOCK_LUA)
+        self._set_if_not_invalidated = redis.register_script(SET_IF_NOT_INVALIDATED_LUA)
+        self.node_id = uuid.uuid4().hex
+        self.stats = {"l1_hits": 0, "l1_misses": 0, "l2_hits": 0, "l2_misses": 0}
+        self.stampede_stats = {"coalesced": 0, "lock_waits": 0, "stale_served": 0, "refreshes": 0}
+
+    async def get_with_ttl(self, key: str) -> tuple[int, bytes | None]:
+        ttl, value = self.l1.get_with_ttl(key)
+        if value is not None:
+            self.stats["l1_hits"] += 1
+            return ttl, value
+        self.stats["l1_misses"] += 1
+        started = time.perf_counter()
+        ttl, value = await super().get_with_ttl(key)
+        observe_cache("get", time.perf_counter() - started)
+        if value is None:
+            self.stats["l2_misses"] += 1
+        else:
+            self.stats["l2_hits"] += 1
+            self.l1.set(key, value, ttl)
+        return ttl, value
+
+    async def get(self, key: str) -> bytes | None:
+        return (await self.get_with_ttl(key))[1]
+
+    def tag_key(self, tag: str) -> str:
+        return f"{self.prefix}:tag:{tag}"
+
+    def mark_key(self, tag: str) -> str:
+        return f"{self.prefix}:mark:{tag}"
+
+    async def tag_marks(self, tags: list[str]) -> list[bytes | None]:
+        # читается до загрузки из базы и передаётся в set(marks=...)
+        return await self.redis.mget([self.mark_key(tag) for tag in tags])
+
+    def version_key(self, tag: str) -> str:
+        return f"{self.prefix}:version:{tag}"
+
+    @staticmethod
+    def version_seed() -> int:
+        # счётчик стартует со времени, а не с нуля: после сброса Redis версии
+        # не повторятся и старые ETag клиентов не совпадут с новыми данными
+        return time.time_ns() // 1000
+
+    async def tag_version(self, tag: str) -> int:
+        key = self.version_key(tag)
+        version = await self.redis.get(key)
+        if version is None:
+            await self.redis.set(key, self.version_seed(), nx=True)
+            version = await self.redis.get(key)
+        return int(version)
+
+    def lock_key(self, key: str) -> str:
+        return f"{self.prefix}:lock:{key.removeprefix(f'{self.prefix}:')}"
+
+    async def acquire_lock(self, key: str, seconds: int) -> str | None:
+        token = uuid.uuid4().hex
+        if await self.redis.set(self.lock_key(key), token, nx=True, ex=seconds):
+            return token
+        return None
+
+    async def release_lock(self, key: str, token: str) -> None:
+        await self._release_lock(keys=[self.lock_key(key)], args=[token])
+
+    def key_tag(self, key: str) -> str:
+        # ключ имеет вид "<prefix>:<tag>:<hash>", тег задаётся namespace роута
+        return key.removeprefix(f"{self.prefix}:").rsplit(":", 1)[0]
+
+    async def set(
+        self,
+        key: str,
+        value: bytes,
+        expire: int | None = None,
+        tags: list[str] | None = None,
+        marks: list[bytes | None] | None = None,
+    ) -> None:
+        tags = tags if tags is not None else [self.key_tag(key)]
+        started = time.perf_counter()
+        if marks is not None:
+            stored = await self._set_if_not_invalidated(
+                keys=[key, *[self.mark_key(tag) for tag in tags], *[self.tag_key(tag) for tag in tags]],
+                args=[value, expire or 0, len(tags), *[mark or b"" for mark in marks]],
+            )
+            observe_cache("set", time.perf_counter() - started)
+            if stored:
+                self.l1.set(key, value, expire)
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(key, value, ex=expire)
+            for tag in tags:
+                tag_key = self.tag_key(tag)
+                pipe.sadd(tag_key, key)
+                if expire:
+                    pipe.expire(tag_key, expire, nx=True)
+                    pipe.expire(tag_key, expire, gt=True)
+            await pipe.execute()
+        observe_cache("set", time.perf_counter() - started)
+        self.l1.set(key, value, expire)
+
+    async def get_many(self, keys: list[str]) -> list[bytes | None]:
+        # L1 для каждого ключа, остальные одним MGET
+        values = [self.l1.get_with_ttl(key)[1] for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        self.stats["l1_hits"] += len(keys) - len(missing)
+        self.stats["l1_misses"] += len(missing)
+        if not missing:
+            return values
+        started = time.perf_counter()
+        fetched = await self.redis.mget([keys[i] for i in missing])
+        observe_cache("get_many", time.perf_counter() - started)
+        for i, value in zip(missing, fetched):
+            if value is None:
+                self.stats["l2_misses"] += 1
+            else:
+                self.stats["l2_hits"] += 1
+                values[i] = value
+                self.l1.set(keys[i], value)
+        return values
+
+    async def set_many(
+        self,
+        entries: list[tuple[str, bytes, list[str]]],
+        expire: int | None = None,
+        marks: dict[str, bytes | None] | None = None,
+    ) -> None:
+        started = time.perf_counter()
+        if marks is not None:
+            # как set(marks=...), но одним пайплайном: каждая запись проверяет метки своих тегов
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value, tags in entries:
+                    await self._set_if_not_invalidated(
+                        keys=[key, *[self.mark_key(tag) for tag in tags], *[self.tag_key(tag) for tag in tags]],
+                        args=[value, expire or 0, len(tags), *[marks.get(tag) or b"" for tag in tags]],
+                        client=pipe,
+                    )
+                stored = await pipe.execute()
+            observe_cache("set_many", time.perf_counter() - started)
+            for (key, value, _), ok in zip(entries, stored):
+                if ok:
+                    self.l1.set(key, value, expire)
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value, tags in entries:
+                pipe.set(key, value, ex=expire)
+                for tag in tags:
+                    pipe.sadd(self.tag_key(tag), key)
+            for tag in {tag for _, _, tags in entries for tag in tags}:
+                if expire:
+                    pipe.expire(self.tag_key(tag), expire, nx=True)
+                    pipe.expire(self.tag_key(tag), expire, gt=True)
+            await pipe.execute()
+        observe_cache("set_many", time.perf_counter() - started)
+        for key, value, _ in entries:
+            self.l1.set(key, value, expire)
+
+    async def invalidate_tags(self, *tags: str) -> list[str]:
+        started = time.perf_counter()
+        keys = await self._invalidate_tags(
+            keys=[self.tag_key(tag) for tag in tags]
+            + [self.mark_key(tag) for tag in tags]
+            + [self.version_key(tag) for tag in tags if tag in VERSIONED_TAGS],
+            args=[self.version_seed(), len(tags), INVALIDATION_MARK_SECONDS],
+        )
+        observe_cache("invalidate", time.perf_counter() - started)
+        keys = [key.decode() if isinstance(key, bytes) else key for key in keys]
+        for key in keys:
+            self.l1.pop(key)
+        if keys:
+            await self.publish(keys=keys)
+        return keys
+
+    async def clear(self, namespace: str | None = None, key: str | None = None) -> int:
+        result = await super().clear(namespace, key)
+        if namespace:
+            self.l1.clear(namespace)
+            await self.publish(namespaces=[namespace])
+        elif key:
+            await self.delete(key)
+        return result
+
+    async def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        await self.redis.delete(*keys)
+        for key in keys:
+            self.l1.pop(key)
+        await self.publish(keys=list(keys))
+
+    async def publish(self, keys: list[str] | None = None, namespaces: list[str] | None = None) -> None:
+        message = {"origin": self.node_id, "keys": keys or [], "namespaces": namespaces or []}
+        await self.redis.publish(self.channel, json.dumps(message))
+
+    def apply_invalidation(self, data: bytes) -> None:
+        message = json.loads(data)
+        if message["origin"] == self.node_id:
+            return
+        for key in message["keys"]:
+            self.l1.pop(key)
+        for namespace in message["namespaces"]:
+            self.l1.clear(namespace)
+
+    async def listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # пока не были подписаны, могли пропустить инвалидации
+                self.l1.clear()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        self.apply_invalidation(message["data"])
+                    except Exception:
+                        # битое сообщение не должно останавливать слушателя
+                        logger.warning("Некорректное сообщение инвалидации: %r", message["data"], exc_info=True)
+            except (RedisConnectionError, OSError):
+                logger.warning("Потеряно соединение с каналом инвалидации кэша", exc_info=True)
+                await asyncio.sleep(1)
+            except Exception:
+                # без слушателя L1 перестал бы получать инвалидации до рестарта процесса
+                logger.exception("Ошибка в канале инвалидации кэша, переподписываемся")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+
+try:
+    import xxhash
+
+    def _key_hash(data: bytes) -> str:
+        return xxhash.xxh3_128_hexdigest(data)
+except ImportError:
+    def _key_hash(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _canonical(value):
+    # после валидации значения по умолчанию уже подставлены; поля модели
+    # отдаём orjson как есть, без model_dump
+    return value.__dict__ if isinstance(value, BaseModel) else value
+
+
+def _canonical_default(value):
+    if isinstance(value, BaseModel):
+        return value.__dict__
+    raise TypeError(f"Аргумент типа {type(value).__name__} не входит в ключ кэша")
+
+
+class CacheKeyBuilder:
+    """Ключ из провалидированных аргументов эндпоинта, а не из сырой строки запроса:
+    порядок параметров, пропущенные значения по умолчанию и лишние параметры не
+    плодят разные записи.
+
+    В ключ идут pydantic-модели (PaginatedParams и т.п.) и скалярные аргументы;
+    зависимости вроде сервисов пропускаются. vary — имена аргументов из
+    зависимостей, от которых тоже зависит ответ, например роль вызывающего.
+    """
+
+    def __init__(self, vary: tuple[str, ...] = ()):
+        self.vary = vary
+
+    def __call__(
+        self,
+        func,
+        namespace: str,
+        *,
+        request: Request | None = None,
+        response: Response | None = None,
+        args=(),
+        kwargs=None,
+    ) -> str:
+        kwargs = kwargs or {}
+        parts = {
+            name: _canonical(value)
+            for name, value in kwargs.items()
+            if isinstance(value, (BaseModel, str, int, float, bool, type(None)))
+        }
+        for name in self.vary:
+            parts[name] = _canonical(kwargs.get(name))
+        endpoint = f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', '')}"
+        digest = _key_hash(
+            orjson.dumps([endpoint, parts], default=_canonical_default, option=orjson.OPT_SORT_KEYS)
+        )
+        # шаблон namespace ("book:{book_id}:reviews") заполняется аргументами вызова,
+        # чтобы ключ и тег совпадали и без запроса, например при прогреве
+        values = dict(request.path_params) if request is not None else {}
+        values.update(kwargs)
+        return f"{namespace.format(**values)}:{digest}"
 
 
 class RedisCache:
     def __init__(self):
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
         self.prefix = "books-cache"
+        self.redis = None
+        self.backend = None
+        self._listener = None
 
-    @staticmethod
-    def custom_key_builder(
-        func, namespace, request: Request, response: Response, *args, **kwargs
-    ):
-        cachekey = hashlib.md5(
-            f"{namespace}:{request.method}:{request.url.path}:{request.url.query}".encode()
-        ).hexdigest()
-        print(cachekey)
-        return f"{namespace}:{cachekey}"
-        # return f"{namespace}:{request.method}:{request.url.path}:{request.url.query}"
+    custom_key_builder = staticmethod(CacheKeyBuilder())
 
     async def init(self):
-        redis = aioredis.from_url(self.redis_url)
+        self.redis = aioredis.from_url(self.redis_url)
+        self.backend = TwoTierBackend(
+            self.redis,
+            LRUCache(settings.CACHE_L1_MAXSIZE, settings.CACHE_L1_TTL),
+            prefix=self.prefix,
+        )
         FastAPICache.init(
-            RedisBackend(redis), prefix=self.prefix, key_builder=self.custom_key_builder
+            self.backend,
+            prefix=self.prefix,
+            key_builder=self.custom_key_builder,
+            coder=RawJSONCoder,
         )
-        return redis
+        self._listener = asyncio.create_task(self.backend.listen())
+        return self.redis
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        await self.redis.close()
+
+
+def get_cache_backend() -> TwoTierBackend | None:
+    try:
+        return FastAPICache.get_backend()
+    except AssertionError:
+        return None
+
+
+_inflight: dict[str, asyncio.Future] = {}
+_refreshes: dict[str, asyncio.Task] = {}
+
+
+def _forget_inflight(key: str, future: asyncio.Future) -> None:
+    if _inflight.get(key) is future:
+        del _inflight[key]
+    if not future.cancelled():
+        # ошибку уже получили ожидающие; без этого asyncio ругается, если их не было
+        future.exception()
+
+
+async def _load_and_store(backend: TwoTierBackend, key: str, load, expire: int) -> bytes:
+    try:
+        marks = await backend.tag_marks([backend.key_tag(key)])
+    except Exception:
+        logger.warning("Не удалось прочитать метки инвалидации %s", key, exc_info=True)
+        marks = None
+    body = RawJSONCoder.encode(await load())
+    try:
+        await backend.set(key, body, expire, marks=marks)
+    except Exception:
+        logger.warning("Не удалось сохранить %s в кэш", key, exc_info=True)
+    return body
+
+
+async def _wait_for_value(backend: TwoTierBackend, key: str, timeout: float) -> bytes | None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        body = await backend.get(key)
+        if body is not None:
+            return body
+    return None
+
+
+async def _load_locked(backend: TwoTierBackend, key: str, load, expire: int) -> bytes:
+    try:
+        token = await backend.acquire_lock(key, settings.CACHE_LOCK_SECONDS)
+    except Exception:
+        logger.warning("Не удалось взять блокировку %s", key, exc_info=True)
+        return await _load_and_store(backend, key, load, expire)
+    if token is None:
+        # значение уже считает другой воркер — ждём его в кэше
+        backend.stampede_stats["lock_waits"] += 1
+        body = await _wait_for_value(backend, key, settings.CACHE_LOCK_SECONDS)
+        if body is not None:
+            return body
+        # держатель блокировки не успел или упал — считаем сами
+        return await _load_and_store(backend, key, load, expire)
+    try:
+        return await _load_and_store(backend, key, load, expire)
+    finally:
+        try:
+            await backend.release_lock(key, token)
+        except Exception:
+            logger.warning("Не удалось снять блокировку %s", key, exc_info=True)
+
+
+async def _single_flight(backend: TwoTierBackend, key: str, load, expire: int) -> bytes:
+    future = _inflight.get(key)
+    if future is None:
+        future = _inflight[key] = asyncio.ensure_future(_load_locked(backend, key, load, expire))
+        future.add_done_callback(lambda done: _forget_inflight(key, done))
+    else:
+        backend.stampede_stats["coalesced"] += 1
+    # отмена одного ожидающего не должна отменять загрузку для остальных
+    return await asyncio.shield(future)
+
+
+async def _call_detached(func, args, kwargs):
+    # загрузка может пережить запрос, который её начал (его отменили, а ответа ждут
+    # склеенные запросы; фоновое обновление идёт после ответа), а сессию запроса
+    # закрывает его же зависимость. Поэтому репозитории из аргументов пересоздаются
+    # на собственной сессии — к тому же серверу, что и у запроса
+    repositories = {name: value for name, value in kwargs.items() if isinstance(value, BaseRepository)}
+    if not repositories:
+        return await func(*args, **kwargs)
+    bind = next(iter(repositories.values())).session.bind
+    async with AsyncSession(bind=bind, expire_on_commit=False) as session:
+        detached = {name: type(value)(session) for name, value in repositories.items()}
+        return await func(*args, **{**kwargs, **detached})
+
+
+async def _refresh(backend: TwoTierBackend, key: str, func, args, kwargs, expire: int) -> None:
+    try:
+        token = await backend.acquire_lock(key, settings.CACHE_LOCK_SECONDS)
+        if token is None:
+            return
+        try:
+            await _load_and_store(backend, key, lambda: _call_detached(func, args, kwargs), expire)
+            backend.stampede_stats["refreshes"] += 1
+        finally:
+            await backend.release_lock(key, token)
+    except Exception:
+        logger.warning("Не удалось обновить устаревшую запись %s", key, exc_info=True)
+
+
+def _refresh_in_background(backend: TwoTierBackend, key: str, func, args, kwargs, expire: int) -> None:
+    if key in _refreshes:
+        return
+    task = asyncio.create_task(_refresh(backend, key, func, args, kwargs, expire))
+    _refreshes[key] = task
+    task.add_done_callback(lambda _: _refreshes.pop(key, None))
+
+
+def _uncacheable(request: Request | None) -> bool:
+    if not FastAPICache.get_enable():
+        return True
+    if request is None:
+        return False
+    return request.method != "GET" or request.headers.get("Cache-Control") == "no-store"
+
+
+def cached(namespace: str, expire: int | None = None, stale: int | None = None, key_builder=None):
+    """Кэш ответа целиком с защитой от лавины промахов.
+
+    Промах по ключу в процессе считает одна корутина, остальные ждут её future;
+    между воркерами считает держатель Redis-блокировки, прочие ждут значение
+    в кэше. Запись хранится expire + stale секунд: последние stale секунд она
+    считается устаревшей, отдаётся как есть, а обновляет её одна фоновая задача.
+    Запрос, если нужен для ключа, передаётся аргументом request.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            backend = get_cache_backend()
+            request = kwargs.get("request")
+            if backend is None or _uncacheable(request):
+                return await func(*args, **kwargs)
+
+            window = settings.CACHE_STALE_SECONDS if stale is None else stale
+            total = (expire or settings.CACHE_TTL) + window
+            key = (key_builder or FastAPICache.get_key_builder())(
+                func, f"{backend.prefix}:{namespace}", request=request, args=args, kwargs=kwargs
+            )
+            try:
+                ttl, body = await backend.get_with_ttl(key)
+            except Exception:
+                logger.warning("Не удалось прочитать %s из кэша", key, exc_info=True)
+                ttl, body = 0, None
+
+            if body is None:
+                body = await _single_flight(backend, key, lambda: _call_detached(func, args, kwargs), total)
+            elif 0 <= ttl <= window:
+                backend.stampede_stats["stale_served"] += 1
+                _refresh_in_background(backend, key, func, args, kwargs, total)
+            return RawJSONResponse(body)
+
+        return wrapper
+
+    return decorator
+
+
+_delayed_invalidations: set[asyncio.Task] = set()
+_hit_writes: set[asyncio.Task] = set()
+
+
+async def _count_book_hit(backend: TwoTierBackend, book_id: int) -> None:
+    try:
+        await backend.redis.zincrby(book_hits_key(backend.prefix), 1, book_id)
+    except Exception:
+        logger.debug("Не удалось учесть обращение к книге %s", book_id, exc_info=True)
+
+
+def count_book_hit(book_id: int) -> None:
+    # счётчик нужен только для прогрева, поэтому ответ его не ждёт
+    backend = get_cache_backend()
+    if backend is None:
+        return
+    task = asyncio.create_task(_count_book_hit(backend, book_id))
+    _hit_writes.add(task)
+    task.add_done_callback(_hit_writes.discard)
+
+
+async def top_book_ids(limit: int) -> list[int]:
+    backend = get_cache_backend()
+    if backend is None or limit <= 0:
+        return []
+    key = book_hits_key(backend.prefix)
+    async with backend.redis.pipeline(transaction=False) as pipe:
+        pipe.zrevrange(key, 0, limit - 1)
+        # хвост, который в прогрев всё равно не попадёт, не храним
+        pipe.zremrangebyrank(key, 0, -limit * 10 - 1)
+        ids, _ = await pipe.execute()
+    return [int(book_id) for book_id in ids]
+
+
+async def _invalidate_tags(*tags: str) -> None:
+    backend = get_cache_backend()
+    if backend is None:
+        return
+    try:
+        await backend.invalidate_tags(*tags)
+    except Exception:
+        # запись уже закоммичена, устаревший кэш доживёт до TTL
+        logger.warning("Не удалось инвалидировать теги кэша %s", tags, exc_info=True)
+
+
+async def _invalidate_tags_later(tags: tuple[str, ...], delay: float) -> None:
+    await asyncio.sleep(delay)
+    await _invalidate_tags(*tags)
+
+
+async def invalidate_tags(*tags: str) -> None:
+    await _invalidate_tags(*tags)
+    if settings.DATABASE_REPLICA_URLS:
+        # пока реплика догоняет, промах кэша может закэшировать старые данные —
+        # повторяем инвалидацию, когда окно отставания закончится
+        task = asyncio.create_task(_invalidate_tags_later(tags, settings.READ_YOUR_WRITES_SECONDS))
+        _delayed_invalidations.add(task)
+        task.add_done_callback(_delayed_invalidations.discard)
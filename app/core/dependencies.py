@@ -1,35 +1,87 @@
+import hashlib
+import hmac
 from typing import AsyncGenerator
-from fastapi import Depends, Request, HTTPException
-from sqlalchemy import select
+from fastapi import Depends, Request, Response, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database.database import session_fabric
-from app.models import User
+from app.core.principal import load_principal
+from app.core.settings import settings
+from app.database.database import session_fabric, read_session_fabric, replica_engines
 from app.models.user import UserRole
+from app.schemas.auth import Principal
 from app.utils.utils import oauth2_scheme, decode_jwt_token
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+PRIMARY_PIN_COOKIE = "db_primary"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+PAYMENT_SIGNATURE_HEADER = "X-Payment-Signature"
+
+
+async def get_db(request: Request, response: Response) -> AsyncGenerator[AsyncSession, None]:
+    # после своей записи клиент какое-то время читает с основного сервера (read-your-writes)
+    if replica_engines and request.method not in SAFE_METHODS:
+        response.set_cookie(
+            PRIMARY_PIN_COOKIE,
+            "1",
+            max_age=settings.READ_YOUR_WRITES_SECONDS,
+            httponly=True,
+            samesite="lax",
+        )
     async with session_fabric() as session:
         yield session
 
 
-async def get_current_user(
-    request: Request,
-    db: AsyncSession = Depends(get_db)
-) -> User:
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    fabric = session_fabric if request.cookies.get(PRIMARY_PIN_COOKIE) else read_session_fabric()
+    async with fabric() as session:
+        yield session
+
+
+async def get_access_payload(request: Request) -> dict:
     token = request.cookies.get("access_token")
     if token is None:
         raise HTTPException(status_code=401, detail="Не авторизован")
     payload = decode_jwt_token(token)
     if payload["token_type"] != "access":
         raise HTTPException(status_code=401, detail="Неправильный тип токена")
-    result = await db.execute(select(User).where(User.id == int(payload["uid"])))
-    user = result.scalar_one_or_none()
+    return payload
+
+
+async def get_current_user(
+    payload: dict = Depends(get_access_payload),
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
+    user = await load_principal(db, int(payload["uid"]))
     if user is None:
         raise HTTPException(status_code=401, detail="Пользователь не найден")
     return user
 
 
-async def require_admin(current_user: User = Depends(get_current_user)):
-    if current_user.role != UserRole.ADMIN:
-        raise HTTPException(status_code=403, detail="Недостаточно прав")
\ No newline at end of file
+async def require_admin(
+    payload: dict = Depends(get_access_payload),
+    db: AsyncSession = Depends(get_db),
+) -> UserRole:
+    # подписанная роль в access-токене позволяет не ходить в хранилище вовсе
+    if settings.TRUST_TOKEN_ROLE and payload.get("role") is not None:
+        role = UserRole(payload["role"])
+    else:
+        current_user = await get_current_user(payload, db)
+        role = current_user.role
+    if role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    return role
+
+
+def payment_signature(idempotence_key: str) -> str:
+    return hmac.new(
+        settings.PAYMENT_WEBHOOK_SECRET.encode(), idempotence_key.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+async def require_payment_provider(request: Request, idempotence_key: str) -> None:
+    # подтверждает оплату только провайдер: ключ платежа знает и покупатель,
+    # а подпись HMAC-SHA256 от ключа — только владелец общего секрета
+    if not settings.PAYMENT_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Подтверждение оплаты не настроено")
+    signature = request.headers.get(PAYMENT_SIGNATURE_HEADER)
+    if signature is None or not hmac.compare_digest(signature, payment_signature(idempotence_key)):
+        raise HTTPException(status_code=401, detail="Неверная подпись платёжного уведомления")
@@ -0,0 +1,36 @@
+import logging
+from fastapi import Request, Response
+from app.core.cache import get_cache_backend
+
+logger = logging.getLogger(__name__)
+
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # для If-None-Match сравнение слабое: префикс W/ не учитывается
+    return any(value.strip().removeprefix("W/") == etag for value in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+async def tag_etag(tag: str) -> str | None:
+    # версия тега растёт при каждой инвалидации, см. INVALIDATE_TAGS_LUA
+    backend = get_cache_backend()
+    if backend is None:
+        return None
+    try:
+        version = await backend.tag_version(tag)
+    except Exception:
+        logger.warning("Не удалось прочитать версию тега %s", tag, exc_info=True)
+        return None
+    return make_etag(tag.replace(":", "-"), version)
@@ -9,6 +9,9 @@ from app.services.exceptions import (
     WrongTokenType,
     TokenExpired,
     InvalidToken,
+    InvalidCursor,
+    OutOfStockError,
+    TransactionExpiredError,
 )
 
 
@@ -37,6 +40,18 @@ def register_exception_handlers(app):
     async def invalid_token_handler(request: Request, exc: InvalidToken):
         return JSONResponse(status_code=401, content={"detail": exc.detail})
 
+    @app.exception_handler(InvalidCursor)
+    async def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+        return JSONResponse(status_code=400, content={"detail": exc.detail})
+
+    @app.exception_handler(OutOfStockError)
+    async def out_of_stock_handler(request: Request, exc: OutOfStockError):
+        return JSONResponse(status_code=409, content={"detail": exc.detail})
+
+    @app.exception_handler(TransactionExpiredError)
+    async def transaction_expired_handler(request: Request, exc: TransactionExpiredError):
+        return JSONResponse(status_code=409, content={"detail": exc.detail})
+
     @app.exception_handler(ValidationError)
     async def validation_error_handler(request: Request, exc: ValidationError):
         return JSONResponse(
@@ -0,0 +1,185 @@
+import bisect
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+CACHE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+
+class Histogram:
+    # без блокировок: всё пишется из одного event loop, а события SQLAlchemy
+    # выполняются в гринлетах того же потока
+    __slots__ = ("bounds", "buckets", "count", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class RouteStats:
+    __slots__ = ("latency", "statuses", "db_queries", "db_seconds")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statuses: dict[int, int] = {}
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+
+class RequestDbStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_request_db: ContextVar[RequestDbStats | None] = ContextVar("request_db", default=None)
+
+route_stats: dict[tuple[str, str], RouteStats] = {}
+db_stats: dict[str, Histogram] = {}
+cache_stats: dict[str, Histogram] = {}
+
+
+def observe_cache(operation: str, seconds: float) -> None:
+    histogram = cache_stats.get(operation)
+    if histogram is None:
+        histogram = cache_stats[operation] = Histogram(CACHE_BUCKETS)
+    histogram.observe(seconds)
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    histogram = db_stats[name] = Histogram(DB_BUCKETS)
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed)
+        request = _request_db.get()
+        if request is not None:
+            request.queries += 1
+            request.seconds += elapsed
+
+
+class MetricsMiddleware:
+    """Чистый ASGI-middleware: латентность и статусы по шаблону роута, запросы к БД на запрос."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        db = RequestDbStats()
+        token = _request_db.set(db)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_db.reset(token)
+            route = scope.get("route")
+            # шаблон пути вместо реального, чтобы не плодить метки на каждый id
+            key = (scope["method"], getattr(route, "path", "unmatched"))
+            stats = route_stats.get(key)
+            if stats is None:
+                stats = route_stats[key] = RouteStats()
+            stats.latency.observe(elapsed)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.db_queries += db.queries
+            stats.db_seconds += db.seconds
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _histogram_lines(name: str, labels: dict, histogram: Histogram) -> list[str]:
+    lines, cumulative = [], 0
+    for bound, count in zip((*histogram.bounds, "+Inf"), histogram.buckets):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {cumulative}")
+    lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return lines
+
+
+class MetricsWriter:
+    def __init__(self):
+        self.lines: list[str] = []
+
+    def metric(self, name: str, kind: str, help_text: str) -> None:
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, value, **labels) -> None:
+        self.lines.append(f"{name}{_labels(labels)} {value}")
+
+    def histogram(self, name: str, histogram: Histogram, **labels) -> None:
+        self.lines.extend(_histogram_lines(name, labels, histogram))
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def write_request_metrics(writer: MetricsWriter) -> None:
+    snapshot = list(route_stats.items())
+
+    writer.metric("http_request_duration_seconds", "histogram", "Латентность HTTP-запросов по роутам")
+    for (method, path), stats in snapshot:
+        writer.histogram("http_request_duration_seconds", stats.latency, method=method, route=path)
+
+    writer.metric("http_requests_total", "counter", "HTTP-запросы по роутам и статусам")
+    for (method, path), stats in snapshot:
+        for status, count in list(stats.statuses.items()):
+            writer.sample("http_requests_total", count, method=method, route=path, status=status)
+
+    writer.metric("http_db_queries_total", "counter", "Запросы к БД, выполненные при обработке роута")
+    for (method, path), stats in snapshot:
+        writer.sample("http_db_queries_total", stats.db_queries, method=method, route=path)
+
+    writer.metric("http_db_query_seconds_total", "counter", "Время запросов к БД при обработке роута")
+    for (method, path), stats in snapshot:
+        writer.sample("http_db_query_seconds_total", stats.db_seconds, method=method, route=path)
+
+    writer.metric("db_query_duration_seconds", "histogram", "Длительность запросов к БД")
+    for name, histogram in list(db_stats.items()):
+        writer.histogram("db_query_duration_seconds", histogram, db=name)
+
+    writer.metric("cache_operation_duration_seconds", "histogram", "Длительность обращений к Redis")
+    for operation, histogram in list(cache_stats.items()):
+        writer.histogram("cache_operation_duration_seconds", histogram, operation=operation)
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from itertools import chain
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.cache import get_cache_backend
+from app.core.settings import settings
+from app.models.user import User
+from app.schemas.auth import Principal
+from app.utils.utils import spawn
+
+logger = logging.getLogger(__name__)
+
+
+def principal_key(prefix: str, uid: int) -> str:
+    return f"{prefix}:principal:{uid}"
+
+
+async def load_principal(db: AsyncSession, uid: int) -> Principal | None:
+    # L1 процесса и Redis через общий кэш-бэкенд, иначе только нужные колонки users
+    backend = get_cache_backend()
+    key = principal_key(backend.prefix, uid) if backend is not None else None
+    if backend is not None:
+        try:
+            cached = await backend.get(key)
+        except Exception:
+            logger.warning("Не удалось прочитать principal %s из кэша", uid, exc_info=True)
+            cached = None
+        if cached is not None:
+            return Principal.model_validate_json(cached)
+
+    result = await db.execute(select(User.id, User.username, User.role).where(User.id == uid))
+    row = result.one_or_none()
+    if row is None:
+        return None
+    principal = Principal.model_validate(row)
+
+    if backend is not None:
+        try:
+            await backend.set(key, principal.model_dump_json().encode(), settings.PRINCIPAL_CACHE_TTL, tags=[])
+        except Exception:
+            logger.warning("Не удалось сохранить principal %s в кэш", uid, exc_info=True)
+    return principal
+
+
+async def invalidate_principals(uids: set[int]) -> None:
+    backend = get_cache_backend()
+    if backend is None:
+        return
+    try:
+        await backend.delete(*[principal_key(backend.prefix, uid) for uid in uids])
+    except Exception:
+        logger.warning("Не удалось инвалидировать principal %s", uids, exc_info=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    uids = {obj.id for obj in chain(session.dirty, session.deleted) if isinstance(obj, User)}
+    if uids:
+        session.info.setdefault("changed_users", set()).update(uids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    uids = session.info.pop("changed_users", None)
+    if not uids:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # синхронная сессия вне event loop (скрипты, миграции данных): коммит уже
+        # прошёл, закэшированный principal доживёт до PRINCIPAL_CACHE_TTL
+        return
+    spawn(invalidate_principals(uids))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop("changed_users", None)
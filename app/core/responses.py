@@ -0,0 +1,33 @@
+from typing import Any
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+
+def orjson_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+def dump_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=orjson_default)
+
+
+class OrjsonResponse(JSONResponse):
+    """JSON через orjson. FastAPI отдаёт готовый Response как есть, без response_model."""
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+
+class RawJSONResponse(JSONResponse):
+    """Уже закодированный JSON, например из кэша."""
+
+    def render(self, content: bytes) -> bytes:
+        return content
+
+
+def paginated_response(page) -> OrjsonResponse:
+    # items уже собраны row_mapper'ом в dict, поэтому хватает поверхностного dict(page)
+    return OrjsonResponse(dict(page))
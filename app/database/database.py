@@ -1,6 +1,43 @@
+from itertools import cycle
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.core.metrics import instrument_engine
 from app.core.settings import settings
+from app.database.pool import MeteredQueuePool
 import app.models
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
-session_fabric = async_sessionmaker(bind=engine, expire_on_commit=False)
\ No newline at end of file
+pool_size, max_overflow = settings.db_pool_limits
+
+
+def create_engine(url: str):
+    return create_async_engine(
+        url,
+        echo=False,
+        poolclass=MeteredQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
+engine = create_engine(settings.DATABASE_URL)
+instrument_engine(engine, "primary")
+session_fabric = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+replica_engines = [create_engine(url) for url in settings.DATABASE_REPLICA_URLS]
+for number, replica in enumerate(replica_engines):
+    instrument_engine(replica, f"replica{number}")
+_replica_fabrics = cycle(
+    [async_sessionmaker(bind=replica, expire_on_commit=False) for replica in replica_engines]
+    or [session_fabric]
+)
+
+
+def read_session_fabric() -> async_sessionmaker:
+    # реплики по кругу; без реплик — основной сервер
+    return next(_replica_fabrics)
@@ -0,0 +1,63 @@
+import bisect
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_seconds_total = 0.0
+        # последний бакет — всё, что дольше WAIT_BUCKETS[-1]
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def observe_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS, seconds)] += 1
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """QueuePool, который считает время ожидания соединения и таймауты."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.checkout_failures += 1
+            raise
+        self.metrics.observe_wait(time.perf_counter() - started)
+        return connection
+
+
+def pool_status(pool: MeteredQueuePool) -> dict:
+    metrics = pool.metrics
+    cumulative, histogram = 0, {}
+    for bound, count in zip((*WAIT_BUCKETS, "+Inf"), metrics.wait_buckets):
+        cumulative += count
+        histogram[str(bound)] = cumulative
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "timeout": pool.timeout(),
+        "checkouts": metrics.checkouts,
+        "checkout_failures": metrics.checkout_failures,
+        "wait_seconds_total": round(metrics.wait_seconds_total, 6),
+        "wait_seconds_histogram": histogram,
+    }
@@ -1,25 +1,45 @@
+import asyncio
 import os
+import contextlib
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
-from app.api.routes import books_router, users_router, shop_router
+from fastapi.responses import HTMLResponse, JSONResponse
+from app.api.routes import books_router, users_router, shop_router, export_router, admin_router, metrics_router
+from app.api.warmup import warm_up_cache, warmup_state
 from app.core.cache import RedisCache
 from app.core.exception_handlers import register_exception_handlers
+from app.core.metrics import MetricsMiddleware
+from app.services.transactions import run_transaction_sweeper
+from app.utils.utils import shutdown_password_pool
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     cache = RedisCache()
     redis = await cache.init()
+    sweeper = asyncio.create_task(run_transaction_sweeper(redis))
+    # запросы принимаем сразу, а готовность по /ready — после прогрева
+    warmup = asyncio.create_task(warm_up_cache())
     yield
-    await redis.close()
+    # фоновые задачи должны завершиться до закрытия Redis, иначе они падают на закрытом клиенте
+    for task in (warmup, sweeper):
+        task.cancel()
+    for task in (warmup, sweeper):
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    await cache.close()
+    shutdown_password_pool()
 
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 app.include_router(books_router)
 app.include_router(users_router)
 app.include_router(shop_router)
+app.include_router(export_router)
+app.include_router(admin_router)
+app.include_router(metrics_router)
 
 
 register_exception_handlers(app)
@@ -27,6 +47,11 @@ register_exception_handlers(app)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
+@app.get("/ready", tags=["ROOT"])
+async def ready():
+    return JSONResponse(warmup_state, status_code=200 if warmup_state["ready"] else 503)
+
+
 @app.get("/", tags=["ROOT"])
 async def root():
     with open("static/index.html", "r", encoding="utf-8") as f:
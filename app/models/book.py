@@ -1,5 +1,5 @@
 from typing import Optional
-from sqlalchemy import String
+from sqlalchemy import String, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database.base import Base
 
@@ -7,14 +7,25 @@ from app.database.base import Base
 class Book(Base):
     __tablename__ = "books"
 
+    __table_args__ = (
+        Index("ix_books_title_trgm", text("lower(title) gin_trgm_ops"), postgresql_using="gin"),
+        Index("ix_books_author_trgm", text("lower(author) gin_trgm_ops"), postgresql_using="gin"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(128))
     author: Mapped[str] = mapped_column(String(128))
     year: Mapped[int | None] = mapped_column()
+    # поддерживаются триггерами на reviews, см. миграцию denormalize_book_ratings
+    rating_sum: Mapped[float] = mapped_column(default=0, server_default="0")
+    reviews_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    # растёт при каждом изменении книги и её отзывов, из него строится ETag
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
 
     reviews: Mapped[list["Review"]] = relationship(
         back_populates="book",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
     shop: Mapped[Optional["ShopItem"]] = relationship(
         back_populates="book",
@@ -22,5 +33,11 @@ class Book(Base):
         cascade="all, delete-orphan",
     )
 
+    @property
+    def avg_rating(self) -> float | None:
+        if not self.reviews_count:
+            return None
+        return round(self.rating_sum / self.reviews_count, 2)
+
     def __repr__(self):
         return f"<Book(id={self.id}, title='{self.title}')>"
\ No newline at end of file
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database.base import Base
-from sqlalchemy import ForeignKey, UniqueConstraint
+from sqlalchemy import ForeignKey, Index, UniqueConstraint
 
 
 class Review(Base):
@@ -8,6 +8,9 @@ class Review(Base):
 
     __table_args__ = (
         UniqueConstraint("book_id", "user_id", name="uq_review_book_user"),
+        # постраничная выдача отзывов книги: новые сверху и по рейтингу
+        Index("ix_reviews_book_id_id", "book_id", "id"),
+        Index("ix_reviews_book_id_rate_id", "book_id", "rate", "id"),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
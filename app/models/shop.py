@@ -12,5 +12,6 @@ class ShopItem(Base):
     )
     price: Mapped[float] = mapped_column()
     stock: Mapped[int] = mapped_column(default=0)
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
 
     book: Mapped["Book"] = relationship("Book", back_populates="shop")
\ No newline at end of file
@@ -1,5 +1,6 @@
+from datetime import datetime
 from enum import Enum as PyEnum
-from sqlalchemy import String, Float, ForeignKey
+from sqlalchemy import String, Float, ForeignKey, Index, DateTime, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 from app.database.base import Base
 
@@ -11,9 +12,25 @@ class TransactionStatus(PyEnum):
 class Transaction(Base):
     __tablename__ = "transactions"
 
+    __table_args__ = (
+        Index(
+            "uq_transactions_pending_item_user",
+            "shop_item_id",
+            "user_id",
+            unique=True,
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+        Index(
+            "ix_transactions_pending_created_at",
+            "created_at",
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
     idempotence_key: Mapped[str] = mapped_column(String(36), unique=True)
     shop_item_id: Mapped[int] = mapped_column(ForeignKey("shop_books.id", ondelete="CASCADE"))
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     amount: Mapped[float] = mapped_column(Float())
-    status: Mapped[TransactionStatus] = mapped_column(default=TransactionStatus.PENDING)
\ No newline at end of file
+    status: Mapped[TransactionStatus] = mapped_column(default=TransactionStatus.PENDING)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
@@ -1,12 +1,15 @@
 from datetime import datetime
 from pydantic import BaseModel
 
+from app.models.user import UserRole
+
 
 class JWTPayload(BaseModel):
     uid: int
     exp: float | None = None
     iat: float | None = None
     token_type: str | None = None
+    role: str | None = None
 
 
 class UserTokens(BaseModel):
@@ -15,4 +18,13 @@ class UserTokens(BaseModel):
 
 
 class RefreshTokenRequest(BaseModel):
-    refresh_token: str
\ No newline at end of file
+    refresh_token: str
+
+
+class Principal(BaseModel):
+    id: int
+    username: str
+    role: UserRole
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,27 @@
+from typing import Generic, List, TypeVar
+
+from pydantic import BaseModel, Field, field_validator
+
+T = TypeVar("T")
+
+MAX_BATCH_SIZE = 100
+
+
+class BatchParams(BaseModel):
+    ids: str = Field(pattern=r"^\d+(,\d+)*$", description="id через запятую")
+
+    @field_validator("ids")
+    @classmethod
+    def validate_ids(cls, v):
+        if v.count(",") >= MAX_BATCH_SIZE:
+            raise ValueError(f"Не больше {MAX_BATCH_SIZE} id за запрос")
+        return v
+
+    @property
+    def id_list(self) -> list[int]:
+        return [int(id) for id in self.ids.split(",")]
+
+
+class BatchResponse(BaseModel, Generic[T]):
+    items: List[T | None]
+    not_found: List[int]
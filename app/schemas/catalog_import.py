@@ -0,0 +1,33 @@
+from pydantic import BaseModel, Field, field_validator
+
+from app.schemas.book import BookCreate
+
+# колонки year и stock — integer в Postgres
+INT4_MAX = 2**31 - 1
+
+
+class BookImportRow(BookCreate):
+    year: int | None = Field(None, ge=0)
+    price: float | None = Field(None, gt=0, allow_inf_nan=False)
+    stock: int = Field(default=0, ge=0, le=INT4_MAX)
+
+    @field_validator("title", "author")
+    @classmethod
+    def reject_nul(cls, value: str) -> str:
+        # Postgres не хранит NUL в text: без проверки упала бы вся пачка
+        if "\x00" in value:
+            raise ValueError("Недопустимый символ NUL")
+        return value
+
+
+class ImportRowError(BaseModel):
+    line: int
+    errors: list[str]
+
+
+class ImportReport(BaseModel):
+    books_inserted: int = 0
+    shop_items_inserted: int = 0
+    rows_failed: int = 0
+    errors: list[ImportRowError] = []
+    errors_truncated: bool = False
@@ -4,30 +4,34 @@ from pydantic import BaseModel, field_validator, Field
 
 T = TypeVar("T")
 
+ALLOWED_PAGE_SIZES = [10, 25, 50, 100]
+
 
 class PaginatedParams(BaseModel):
     page: int = Field(ge=1, default=1)
     page_size: int = 10
+    cursor: str | None = Field(None, max_length=512)
+    with_total: bool = True
 
     @field_validator("page_size")
     @classmethod
     def validate_page_size(cls, v):
-        allowed = [10, 25, 50, 100]
-        if v not in allowed:
-            raise ValueError(f"page_size должен быть одним из: {allowed}")
+        if v not in ALLOWED_PAGE_SIZES:
+            raise ValueError(f"page_size должен быть одним из: {ALLOWED_PAGE_SIZES}")
         return v
 
 
 class PaginatedResponse(BaseModel, Generic[T]):
     items: List[T]
-    total: int
+    total: int | None = None
     page: int
     page_size: int
-    total_pages: int
+    total_pages: int | None = None
+    next_cursor: str | None = None
 
     class Config:
         from_attributes = True
 
 
 class SearchParams(PaginatedParams):
-    query: str = Field(min_length=1, max_length=128)
\ No newline at end of file
+    query: str = Field(min_length=1, max_length=128)
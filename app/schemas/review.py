@@ -1,5 +1,7 @@
+from enum import Enum
 from typing import Any
 from pydantic import BaseModel, Field, field_validator
+from app.schemas.pagination import PaginatedParams
 
 
 class ReviewBase(BaseModel):
@@ -24,4 +26,13 @@ class ReviewResponse(ReviewBase):
     user_id: int
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class ReviewSort(str, Enum):
+    NEWEST = "new"
+    RATING = "rating"
+
+
+class ReviewParams(PaginatedParams):
+    sort: ReviewSort = ReviewSort.NEWEST
@@ -1,59 +1,106 @@
-from typing import List
 from fastapi.params import Depends
-from sqlalchemy import select, func, or_
+from sqlalchemy import select, func, or_, any_, bindparam, exists, Float, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.dependencies import get_db
+from app.core.cache import (
+    BOOKS_LIST_TAG,
+    SHOP_LIST_TAG,
+    book_entity_key,
+    book_reviews_tag,
+    book_tag,
+    invalidate_tags,
+)
+from app.core.dependencies import get_db, get_read_db
 from app.database.repository import BaseRepository
 from app.models.book import Book
 from app.models.review import Review
+from app.schemas.batch import BatchResponse
 from app.schemas.book import BookCreate, BookUpdate, BookResponse
-from app.schemas.pagination import PaginatedResponse
-from app.schemas.review import ReviewCreate
+from app.schemas.pagination import PaginatedParams, PaginatedResponse, SearchParams
+from app.schemas.review import ReviewCreate, ReviewParams, ReviewResponse, ReviewSort
 from app.services.exceptions import NotFoundError, AlreadyExistsError
-from app.utils.utils import paginate
+from app.utils.utils import fetch_batch, paginate, switch_layout
+
+SEARCH_SIMILARITY_THRESHOLD = 0.2
 
 
 class BooksService(BaseRepository):
     model = Book
 
     async def get_book_by_id(self, id: int) -> Book:
-        result = await self.session.execute(
-            select(Book, func.avg(Review.rate), func.count(Review.id))
-            .outerjoin(Review)
-            .where(Book.id == id)
-            .group_by(Book.id)
-        )
-        row = result.first()
-        if row is None:
+        result = await self.session.execute(select(Book).where(Book.id == id))
+        book = result.scalar_one_or_none()
+        if book is None:
             raise NotFoundError(f"Книга {id} не найдена")
-        book, avg_rating, reviews_count = row
-        book.avg_rating = round(avg_rating, 2) if avg_rating else None
-        book.reviews_count = reviews_count
         return book
 
+    async def get_book_version(self, id: int) -> int:
+        # только PK-индекс и одна колонка — для ответа 304 без агрегатов
+        version = await self.session.scalar(select(Book.version).where(Book.id == id))
+        if version is None:
+            raise NotFoundError(f"Книга {id} не найдена")
+        return version
+
     @staticmethod
-    def book_row_mapper(row):
-        book, avg_rating, reviews_count = row
-        book.avg_rating = round(avg_rating, 2) if avg_rating else None
-        book.reviews_count = reviews_count
+    def book_row_mapper(book: Book) -> BookResponse:
         return BookResponse.model_validate(book)
 
-    async def get_all_books(self, page: int, page_size: int) -> PaginatedResponse[BookResponse]:
-        stmt = (
-            select(Book, func.avg(Review.rate), func.count(Review.id))
-            .outerjoin(Review)
-            .group_by(Book.id)
-            .order_by(Book.id)
-        )
+    @staticmethod
+    def book_row_dict(book: Book) -> dict:
+        # строки из БД уже валидны: списки собираются в dict по полям BookResponse
+        return {
+            "title": book.title,
+            "author": book.author,
+            "year": book.year,
+            "id": book.id,
+            "avg_rating": book.avg_rating,
+            "reviews_count": book.reviews_count,
+        }
+
+    @staticmethod
+    def review_row_dict(review: Review) -> dict:
+        return {
+            "rate": review.rate,
+            "description": review.description,
+            "id": review.id,
+            "book_id": review.book_id,
+            "user_id": review.user_id,
+        }
+
+    async def get_all_books(self, params: PaginatedParams) -> PaginatedResponse[BookResponse]:
+        stmt = select(Book).order_by(Book.id)
         return await paginate(
             session=self.session,
             stmt=stmt,
-            page=page,
-            page_size=page_size,
+            page=params.page,
+            page_size=params.page_size,
             count_stmt=select(func.count()).select_from(Book),
-            row_mapper=BooksService.book_row_mapper,
-            use_scalars=False
+            row_mapper=BooksService.book_row_dict,
+            use_scalars=True,
+            cursor=params.cursor,
+            sort_keys=[Book.id],
+            cursor_getter=lambda book: (book.id,),
+            with_total=params.with_total,
+        )
+
+    async def get_books_by_ids(self, ids: list[int]) -> list[Book]:
+        result = await self.session.execute(
+            select(Book).where(Book.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+        )
+        return list(result.scalars())
+
+    async def get_books_batch(self, ids: list[int]) -> BatchResponse[BookResponse]:
+        async def load(missing: list[int]) -> dict[int, BookResponse]:
+            books = await self.get_books_by_ids(missing)
+            return {book.id: BooksService.book_row_mapper(book) for book in books}
+
+        return await fetch_batch(
+            ids,
+            key_for=book_entity_key,
+            load=load,
+            schema=BookResponse,
+            tags_for=lambda id: [book_tag(id)],
         )
 
     async def create_book(self, body: BookCreate) -> Book:
@@ -61,30 +108,60 @@ class BooksService(BaseRepository):
         self.session.add(book)
         await self.session.commit()
         await self.session.refresh(book)
+        await invalidate_tags(BOOKS_LIST_TAG)
         return book
 
     async def delete_book(self, id: int) -> None:
         book = await self.get_book_by_id(id)
         await self.session.delete(book)
         await self.session.commit()
+        await invalidate_tags(book_tag(id), book_reviews_tag(id), BOOKS_LIST_TAG, SHOP_LIST_TAG)
 
     async def update_book(self, id: int, body: BookUpdate) -> Book:
         book = await self.get_book_by_id(id)
         for field, value in body.model_dump(exclude_none=True).items():
             setattr(book, field, value)
+        book.version = Book.version + 1
         await self.session.commit()
         await self.session.refresh(book)
+        await invalidate_tags(book_tag(id), BOOKS_LIST_TAG, SHOP_LIST_TAG)
         return book
 
-    async def get_reviews_by_book_id(self, book_id: int) -> list[Review]:
-        await self.get_book_by_id(book_id)
-        stmt = await self.session.execute(
-            select(Review).where(Review.book_id == book_id)
+    async def book_exists(self, id: int) -> bool:
+        # EXISTS по первичному ключу: строку книги не читаем
+        return await self.session.scalar(select(exists().where(Book.id == id)))
+
+    async def get_reviews_by_book_id(
+        self, book_id: int, params: ReviewParams
+    ) -> PaginatedResponse[ReviewResponse]:
+        if not await self.book_exists(book_id):
+            raise NotFoundError(f"Книга {book_id} не найдена")
+        if params.sort == ReviewSort.RATING:
+            sort_keys = [Review.rate, Review.id]
+        else:
+            sort_keys = [Review.id]
+        stmt = (
+            select(Review)
+            .where(Review.book_id == book_id)
+            .order_by(*[key.desc() for key in sort_keys])
+        )
+        # число отзывов уже денормализовано в books
+        reviews_count = select(Book.reviews_count).where(Book.id == book_id).scalar_subquery()
+        return await paginate(
+            session=self.session,
+            stmt=stmt,
+            page=params.page,
+            page_size=params.page_size,
+            count_stmt=select(func.coalesce(reviews_count, 0)),
+            row_mapper=BooksService.review_row_dict,
+            use_scalars=True,
+            cursor=params.cursor,
+            sort_keys=sort_keys,
+            cursor_getter=lambda review: tuple(getattr(review, key.key) for key in sort_keys),
+            descending=True,
+            with_total=params.with_total,
+            allow_empty=True,
         )
-        reviews = list(stmt.scalars().all())
-        if not reviews:
-            raise NotFoundError(f"Отзывы на книгу {book_id} не найдены")
-        return reviews
 
     async def create_book_review(
         self, book_id: int, body: ReviewCreate, user_id: int
@@ -95,36 +172,53 @@ class BooksService(BaseRepository):
             self.session.add(new_review)
             await self.session.commit()
             await self.session.refresh(new_review)
-            return new_review
         except IntegrityError:
             await self.session.rollback()
             raise AlreadyExistsError(f"Вы уже оставили отзыв на книгу {book_id}")
+        # рейтинг книги отображается и в карточке, и в списках
+        await invalidate_tags(book_tag(book_id), book_reviews_tag(book_id), BOOKS_LIST_TAG, SHOP_LIST_TAG)
+        return new_review
 
-    async def search_books(self, query: str) -> List[Book]:
-        result = await self.session.execute(
-            select(Book, func.avg(Review.rate), func.count(Review.id))
-            .outerjoin(Review)
-            .where(
-                or_(
-                    func.similarity(func.lower(Book.title), query.lower()) > 0.2,
-                    func.similarity(func.lower(Book.author), query.lower()) > 0.2,
-                )
-            )
-            .group_by(Book.id)
-            .order_by(
-                func.greatest(
-                    func.similarity(func.lower(Book.title), query.lower()),
-                    func.similarity(func.lower(Book.author), query.lower()),
-                ).desc()
-            )
+    async def search_books(self, params: SearchParams) -> PaginatedResponse[BookResponse]:
+        # все варианты раскладки ищутся одним запросом; оператор % использует GIN-индексы,
+        # similarity считается только для строк, прошедших индекс
+        variants = switch_layout(params.query.lower())
+        title, author = func.lower(Book.title), func.lower(Book.author)
+        condition = or_(
+            *[title.op("%")(variant) for variant in variants],
+            *[author.op("%")(variant) for variant in variants],
+        )
+        score = func.greatest(
+            *[func.similarity(title, variant) for variant in variants],
+            *[func.similarity(author, variant) for variant in variants],
+            type_=Float,
+        )
+        labeled_score = score.label("score")
+        await self.session.execute(
+            select(func.set_config("pg_trgm.similarity_threshold", str(SEARCH_SIMILARITY_THRESHOLD), True))
+        )
+        stmt = (
+            select(Book, labeled_score)
+            .where(condition)
+            .order_by(labeled_score.desc(), Book.id.desc())
+        )
+        return await paginate(
+            session=self.session,
+            stmt=stmt,
+            page=params.page,
+            page_size=params.page_size,
+            count_stmt=select(func.count()).select_from(Book).where(condition),
+            row_mapper=lambda row: BooksService.book_row_dict(row[0]),
+            cursor=params.cursor,
+            sort_keys=[score, Book.id],
+            cursor_getter=lambda row: (row.score, row[0].id),
+            descending=True,
+            with_total=params.with_total,
         )
-        rows = result.all()
-        books = []
-        for book, avg_rating, reviews_count in rows:
-            book.avg_rating = round(avg_rating, 2) if avg_rating else None
-            book.reviews_count = reviews_count
-            books.append(book)
-        return books
 
 def get_books_service(session: AsyncSession = Depends(get_db)):
+    return BooksService(session)
+
+
+def get_books_read_service(session: AsyncSession = Depends(get_read_db)):
     return BooksService(session)
\ No newline at end of file
@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, Literal
+from fastapi import Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.dependencies import get_read_db
+from app.database.repository import BaseRepository
+from app.models import Book, Review, ShopItem
+
+EXPORT_BATCH_SIZE = 1000
+
+ExportFormat = Literal["ndjson", "csv"]
+
+
+def _avg_rating(rating_sum: float, reviews_count: int) -> float | None:
+    return round(rating_sum / reviews_count, 2) if reviews_count else None
+
+
+class CatalogExportService(BaseRepository):
+    model = Book
+
+    def export_books(self, fmt: ExportFormat, since_id: int = 0) -> AsyncIterator[str]:
+        stmt = (
+            select(Book.id, Book.title, Book.author, Book.year, Book.rating_sum, Book.reviews_count)
+            .where(Book.id > since_id)
+            .order_by(Book.id)
+        )
+        fields = ["id", "title", "author", "year", "avg_rating", "reviews_count"]
+        return self._stream(stmt, fmt, fields, lambda row: {
+            "id": row.id,
+            "title": row.title,
+            "author": row.author,
+            "year": row.year,
+            "avg_rating": _avg_rating(row.rating_sum, row.reviews_count),
+            "reviews_count": row.reviews_count,
+        })
+
+    def export_shop_items(self, fmt: ExportFormat, since_id: int = 0) -> AsyncIterator[str]:
+        stmt = (
+            select(ShopItem.id, ShopItem.book_id, ShopItem.price, ShopItem.stock, Book.title, Book.author)
+            .join(ShopItem.book)
+            .where(ShopItem.id > since_id)
+            .order_by(ShopItem.id)
+        )
+        fields = ["id", "book_id", "price", "stock", "title", "author"]
+        return self._stream(stmt, fmt, fields, lambda row: dict(row._mapping))
+
+    def export_reviews(self, fmt: ExportFormat, since_id: int = 0) -> AsyncIterator[str]:
+        stmt = (
+            select(Review.id, Review.book_id, Review.user_id, Review.rate, Review.description)
+            .where(Review.id > since_id)
+            .order_by(Review.id)
+        )
+        fields = ["id", "book_id", "user_id", "rate", "description"]
+        return self._stream(stmt, fmt, fields, lambda row: dict(row._mapping))
+
+    async def _stream(self, stmt, fmt: ExportFormat, fields: list[str], to_dict) -> AsyncIterator[str]:
+        # серверный курсор: в памяти одновременно не больше EXPORT_BATCH_SIZE строк
+        result = await self.session.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=fields)
+            writer.writeheader()
+            yield buffer.getvalue()
+        async for partition in result.partitions():
+            if fmt == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(to_dict(row) for row in partition)
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(to_dict(row), ensure_ascii=False) + "\n" for row in partition)
+
+
+def get_catalog_export_service(session: AsyncSession = Depends(get_read_db)):
+    return CatalogExportService(session)
@@ -0,0 +1,181 @@
+import csv
+import json
+import logging
+from typing import AsyncIterator, Literal
+from fastapi import Depends
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import BOOKS_LIST_TAG, SHOP_LIST_TAG, invalidate_tags
+from app.core.dependencies import get_db
+from app.database.repository import BaseRepository
+from app.models import Book, ShopItem
+from app.schemas.catalog_import import BookImportRow, ImportReport, ImportRowError
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+MAX_LINE_BYTES = 1 << 20
+
+ImportFormat = Literal["ndjson", "csv"]
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes], max_length: int = MAX_LINE_BYTES
+) -> AsyncIterator[bytes | None]:
+    # None вместо строки длиннее max_length: её остаток до перевода строки отбрасывается,
+    # так что память ограничена max_length при любом размере файла
+    buffer = bytearray()
+    skipping = False
+    async for chunk in chunks:
+        start = 0
+        while (end := chunk.find(b"\n", start)) != -1:
+            if skipping:
+                skipping = False
+            else:
+                buffer += chunk[start:end]
+                yield bytes(buffer) if len(buffer) <= max_length else None
+            buffer.clear()
+            start = end + 1
+        if not skipping:
+            buffer += chunk[start:]
+            if len(buffer) > max_length:
+                buffer.clear()
+                skipping = True
+                yield None
+    if buffer:
+        yield bytes(buffer)
+
+
+async def iter_records(
+    chunks: AsyncIterator[bytes], fmt: ImportFormat
+) -> AsyncIterator[tuple[int, str | None, str | None]]:
+    # (номер первой строки записи, текст, ошибка). Запись CSV может занимать несколько
+    # строк, если перевод строки стоит внутри поля в кавычках (RFC 4180): кавычки внутри
+    # поля удваиваются, поэтому запись закончена, когда их число чётное
+    pending: list[str] = []
+    start = size = quotes = 0
+    line_no = 0
+    async for raw in iter_lines(chunks):
+        line_no += 1
+        error = None
+        if raw is None:
+            error = f"строка длиннее {MAX_LINE_BYTES} байт"
+        else:
+            try:
+                line = raw.decode("utf-8-sig" if line_no == 1 else "utf-8").rstrip("\r")
+            except UnicodeDecodeError as exc:
+                error = str(exc)
+        if error is not None:
+            yield (start if pending else line_no), None, error
+            pending, size, quotes = [], 0, 0
+            continue
+
+        if fmt != "csv":
+            if line.strip():
+                yield line_no, line, None
+            continue
+        if not pending:
+            if not line.strip():
+                continue
+            start = line_no
+        pending.append(line)
+        size += len(raw)
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            yield start, "\n".join(pending), None
+            pending, size, quotes = [], 0, 0
+        elif size > MAX_LINE_BYTES:
+            yield start, None, f"запись длиннее {MAX_LINE_BYTES} байт: не закрыта кавычка?"
+            pending, size, quotes = [], 0, 0
+    if pending:
+        yield start, None, "не закрыта кавычка в последней записи"
+
+
+class CatalogImportService(BaseRepository):
+    model = Book
+
+    async def import_catalog(self, chunks: AsyncIterator[bytes], fmt: ImportFormat) -> ImportReport:
+        # в памяти держится только текущая пачка строк и ограниченный список ошибок
+        report = ImportReport()
+        batch: list[tuple[int, BookImportRow]] = []
+        header = None
+        async for line_no, text, error in iter_records(chunks, fmt):
+            if error is not None:
+                self._add_error(report, line_no, [error])
+                continue
+            try:
+                if fmt == "csv":
+                    values = next(csv.reader([text]))
+                    if header is None:
+                        header = [name.strip() for name in values]
+                        continue
+                    record = {key: value for key, value in zip(header, values) if value != ""}
+                else:
+                    record = json.loads(text)
+                batch.append((line_no, BookImportRow.model_validate(record)))
+            except ValidationError as exc:
+                self._add_error(report, line_no, [f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()])
+            except (ValueError, csv.Error) as exc:
+                self._add_error(report, line_no, [str(exc)])
+
+            if len(batch) >= IMPORT_CHUNK_SIZE:
+                await self._flush(batch, report)
+                batch = []
+        if batch:
+            await self._flush(batch, report)
+
+        if report.books_inserted:
+            await invalidate_tags(BOOKS_LIST_TAG, SHOP_LIST_TAG)
+        return report
+
+    async def _flush(self, batch: list[tuple[int, BookImportRow]], report: ImportReport) -> None:
+        # многострочный INSERT ... RETURNING в порядке параметров, чтобы связать товары с книгами
+        try:
+            result = await self.session.execute(
+                insert(Book).returning(Book.id, sort_by_parameter_order=True),
+                [row.model_dump(include={"title", "author", "year"}) for _, row in batch],
+            )
+            book_ids = result.scalars().all()
+            shop_rows = [
+                {"book_id": book_id, "price": row.price, "stock": row.stock}
+                for book_id, (_, row) in zip(book_ids, batch)
+                if row.price is not None
+            ]
+            shop_inserted = 0
+            if shop_rows:
+                result = await self.session.execute(
+                    pg_insert(ShopItem).on_conflict_do_nothing(index_elements=["book_id"]).returning(ShopItem.id),
+                    shop_rows,
+                )
+                shop_inserted = len(result.scalars().all())
+            await self.session.commit()
+        except DBAPIError as exc:
+            await self.session.rollback()
+            if len(batch) > 1 and not exc.connection_invalidated:
+                # одна плохая строка не должна валить всю пачку: повторяем построчно,
+                # чтобы в отчёт попали только виновные строки
+                logger.warning("Не удалось записать пачку импорта, повторяем построчно", exc_info=True)
+                for item in batch:
+                    await self._flush([item], report)
+                return
+            for line_no, _ in batch:
+                self._add_error(report, line_no, [f"ошибка базы данных: {exc.orig}"])
+            return
+        report.books_inserted += len(book_ids)
+        report.shop_items_inserted += shop_inserted
+
+    @staticmethod
+    def _add_error(report: ImportReport, line_no: int, errors: list[str]) -> None:
+        report.rows_failed += 1
+        if len(report.errors) < MAX_REPORTED_ERRORS:
+            report.errors.append(ImportRowError(line=line_no, errors=errors))
+        else:
+            report.errors_truncated = True
+
+
+def get_catalog_import_service(session: AsyncSession = Depends(get_db)):
+    return CatalogImportService(session)
@@ -32,3 +32,21 @@ class InvalidToken(Exception):
     def __init__(self, detail: str = "Токен неправильный"):
         self.detail = detail
         super().__init__(detail)
+
+
+class InvalidCursor(Exception):
+    def __init__(self, detail: str = "Некорректный курсор"):
+        self.detail = detail
+        super().__init__(detail)
+
+
+class OutOfStockError(Exception):
+    def __init__(self, detail: str = "Товар закончился"):
+        self.detail = detail
+        super().__init__(detail)
+
+
+class TransactionExpiredError(Exception):
+    def __init__(self, detail: str = "Транзакция просрочена"):
+        self.detail = detail
+        super().__init__(detail)
@@ -1,18 +1,31 @@
+import logging
 import uuid
 from fastapi import Depends
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload, contains_eager
-from app.core.dependencies import get_db
+from app.core.cache import SHOP_LIST_TAG, get_cache_backend, invalidate_tags, shop_item_entity_key
+from app.core.dependencies import get_db, get_read_db
+from app.core.settings import settings
 from app.database.repository import BaseRepository
-from app.models import ShopItem, Book, Review, Transaction
+from app.models import ShopItem, Book, Transaction
 from app.models.transaction import TransactionStatus
+from app.schemas.batch import BatchResponse
 from app.schemas.pagination import PaginatedParams, PaginatedResponse
 from app.schemas.shop import ShopItemCreate, ShopItemUpdate, ShopItemResponse
 from app.schemas.transaction import TransactionResponse
-from app.services.exceptions import NotFoundError, AlreadyExistsError
-from app.utils.utils import paginate
+from app.services.exceptions import (
+    NotFoundError,
+    AlreadyExistsError,
+    OutOfStockError,
+    TransactionExpiredError,
+)
+from app.services.books import BooksService
+from app.utils.utils import fetch_batch, paginate
+
+logger = logging.getLogger(__name__)
 
 
 class ShopService(BaseRepository):
@@ -22,19 +35,24 @@ class ShopService(BaseRepository):
         return await self._get_or_raise(id, options=[joinedload(ShopItem.book)])
 
     @staticmethod
-    def shop_row_mapper(row):
-        item, avg_rating, reviews_count = row
-        item.book.avg_rating = round(avg_rating, 2) if avg_rating else None
-        item.book.reviews_count = reviews_count
+    def shop_row_mapper(item: ShopItem) -> ShopItemResponse:
         return ShopItemResponse.model_validate(item)
 
+    @staticmethod
+    def shop_row_dict(item: ShopItem) -> dict:
+        return {
+            "price": item.price,
+            "stock": item.stock,
+            "id": item.id,
+            "book": BooksService.book_row_dict(item.book),
+        }
+
     async def get_shop_items(self, params: PaginatedParams) -> PaginatedResponse:
         stmt = (
-            select(ShopItem, func.avg(Review.rate), func.count(Review.id))
+            select(ShopItem)
             .join(ShopItem.book)
-            .outerjoin(Review, Review.book_id == ShopItem.book_id)
             .options(contains_eager(ShopItem.book))
-            .group_by(ShopItem.id, Book.id)
+            .order_by(ShopItem.id)
         )
         count_stmt = select(func.count()).select_from(ShopItem)
         paginated_items = await paginate(
@@ -43,10 +61,33 @@ class ShopService(BaseRepository):
             page=params.page,
             page_size=params.page_size,
             count_stmt=count_stmt,
-            row_mapper=ShopService.shop_row_mapper,
+            row_mapper=ShopService.shop_row_dict,
+            use_scalars=True,
+            cursor=params.cursor,
+            sort_keys=[ShopItem.id],
+            cursor_getter=lambda item: (item.id,),
+            with_total=params.with_total,
         )
         return paginated_items
 
+    async def get_shop_items_batch(self, ids: list[int]) -> BatchResponse[ShopItemResponse]:
+        async def load(missing: list[int]) -> dict[int, ShopItemResponse]:
+            result = await self.session.execute(
+                select(ShopItem)
+                .join(ShopItem.book)
+                .options(contains_eager(ShopItem.book))
+                .where(ShopItem.id == any_(bindparam("ids", missing, type_=ARRAY(Integer))))
+            )
+            return {item.id: ShopService.shop_row_mapper(item) for item in result.scalars()}
+
+        return await fetch_batch(
+            ids,
+            key_for=shop_item_entity_key,
+            load=load,
+            schema=ShopItemResponse,
+            tags_for=lambda id: [SHOP_LIST_TAG],
+        )
+
     async def create_shop_item(self, shop_item: ShopItemCreate) -> ShopItem:
         res = await self.session.execute(
             select(Book).where(Book.id == shop_item.book_id)
@@ -57,15 +98,16 @@ class ShopService(BaseRepository):
             new_shop_item = ShopItem(**shop_item.model_dump())
             self.session.add(new_shop_item)
             await self.session.commit()
-            result = await self.session.execute(
-                select(ShopItem)
-                .options(joinedload(ShopItem.book))
-                .where(ShopItem.id == new_shop_item.id)
-            )
-            return result.scalar_one()
         except IntegrityError:
             await self.session.rollback()
             raise AlreadyExistsError(f"Книга {shop_item.book_id} уже есть в магазине")
+        await invalidate_tags(SHOP_LIST_TAG)
+        result = await self.session.execute(
+            select(ShopItem)
+            .options(joinedload(ShopItem.book))
+            .where(ShopItem.id == new_shop_item.id)
+        )
+        return result.scalar_one()
 
     async def update_shop_item(
         self, shop_item_id: int, shop_item: ShopItemUpdate
@@ -73,52 +115,122 @@ class ShopService(BaseRepository):
         item = await self.get_item_by_id(shop_item_id)
         for field, value in shop_item.model_dump(exclude_none=True).items():
             setattr(item, field, value)
+        item.version = ShopItem.version + 1
         await self.session.commit()
         await self.session.refresh(item)
+        await invalidate_tags(SHOP_LIST_TAG)
         return item
 
     async def delete_shop_item(self, shop_item_id: int) -> None:
         item = await self.get_item_by_id(shop_item_id)
         await self.session.delete(item)
         await self.session.commit()
+        await invalidate_tags(SHOP_LIST_TAG)
 
     async def create_item_purchase(self, shop_item_id: int, user_id: int) -> dict:
+        # резерв одним условным UPDATE: stock > 0 исключает overselling, а строка
+        # товара заблокирована только до коммита этой короткой транзакции
         result = await self.session.execute(
-            select(Transaction).where(
-                Transaction.shop_item_id == shop_item_id,
-                Transaction.user_id == user_id,
-                Transaction.status == TransactionStatus.PENDING,
+            update(ShopItem)
+            .where(ShopItem.id == shop_item_id, ShopItem.stock > 0)
+            .values(stock=ShopItem.stock - 1, version=ShopItem.version + 1)
+            .returning(
+                ShopItem.price,
+                ShopItem.stock,
+                select(Book.title).where(Book.id == ShopItem.book_id).scalar_subquery(),
             )
+            .execution_options(synchronize_session=False)
         )
-        existing = result.scalar_one_or_none()
-        if existing:
-            raise AlreadyExistsError(
-                f"Транзакция уже существует, url: http://localhost:8000/shop/pay/{existing.idempotence_key}"
-            )
+        reserved = result.first()
+        if reserved is None:
+            await self.session.rollback()
+            await self.get_item_by_id(shop_item_id)
+            raise OutOfStockError(f"Товар {shop_item_id} закончился")
+        price, _, title = reserved
 
-        item = await self.get_item_by_id(shop_item_id)
         idempotence_key = str(uuid.uuid4())
         transaction = Transaction(
             idempotence_key=idempotence_key,
             shop_item_id=shop_item_id,
             user_id=user_id,
-            amount=item.price,
+            amount=price,
             status=TransactionStatus.PENDING,
         )
         self.session.add(transaction)
-        await self.session.commit()
-        await self.session.refresh(transaction)
+        try:
+            await self.session.commit()
+        except IntegrityError:
+            # уникальный частичный индекс по PENDING: откат возвращает и резерв
+            await self.session.rollback()
+            existing_key = await self.session.scalar(
+                select(Transaction.idempotence_key).where(
+                    Transaction.shop_item_id == shop_item_id,
+                    Transaction.user_id == user_id,
+                    Transaction.status == TransactionStatus.PENDING,
+                )
+            )
+            raise AlreadyExistsError(
+                f"Транзакция уже существует, url: http://localhost:8000/shop/pay/{existing_key}"
+            )
+        # остаток виден в списке и в batch-ответах: сбрасываем их после каждого резерва
+        await invalidate_tags(SHOP_LIST_TAG)
 
         return {
             "transaction_id": transaction.id,
             "payment_id": idempotence_key,
-            "amount": item.price,
+            "amount": price,
             "user_id": transaction.user_id,
             "status": transaction.status,
             "confirmation_url": f"http://localhost:8000/shop/pay/{idempotence_key}",
-            "description": f"Оплата книги: {item.book.title}",
+            "description": f"Оплата книги: {title}",
         }
 
+    async def confirm_payment(self, idempotence_key: str) -> TransactionResponse:
+        # повторы и дубли вебхуков отвечаются из записи идемпотентности без похода в Postgres
+        backend = get_cache_backend()
+        record_key = f"{backend.prefix}:payment:{idempotence_key}" if backend is not None else None
+        if backend is not None:
+            try:
+                record = await backend.get(record_key)
+            except Exception:
+                logger.warning("Не удалось прочитать запись оплаты %s", idempotence_key, exc_info=True)
+                record = None
+            if record is not None:
+                return TransactionResponse.model_validate_json(record)
+
+        # переход PENDING -> COMPLETED ровно один раз, гонка со сборщиком просрочек тоже решается здесь
+        result = await self.session.execute(
+            update(Transaction)
+            .where(
+                Transaction.idempotence_key == idempotence_key,
+                Transaction.status == TransactionStatus.PENDING,
+            )
+            .values(status=TransactionStatus.COMPLETED)
+            .returning(Transaction)
+            .execution_options(synchronize_session=False)
+        )
+        transaction = result.scalar_one_or_none()
+        if transaction is not None:
+            await self.session.commit()
+        else:
+            transaction = await self.session.scalar(
+                select(Transaction).where(Transaction.idempotence_key == idempotence_key)
+            )
+            if transaction is None:
+                raise NotFoundError(f"Транзакция {idempotence_key} не найдена")
+            if transaction.status != TransactionStatus.COMPLETED:
+                raise TransactionExpiredError(f"Транзакция {idempotence_key} просрочена")
+
+        response = TransactionResponse.model_validate(transaction)
+        if backend is not None:
+            try:
+                await backend.set(
+                    record_key, response.model_dump_json().encode(), settings.PAYMENT_IDEMPOTENCY_TTL, tags=[]
+                )
+            except Exception:
+                logger.warning("Не удалось сохранить запись оплаты %s", idempotence_key, exc_info=True)
+        return response
+
     async def get_transaction_by_id(self, transaction_id: int) -> TransactionResponse:
         result = await self.session.execute(
             select(Transaction).where(Transaction.id == transaction_id))
@@ -130,3 +242,7 @@ class ShopService(BaseRepository):
 
 def get_shop_items_service(session: AsyncSession = Depends(get_db)):
     return ShopService(session)
+
+
+def get_shop_items_read_service(session: AsyncSession = Depends(get_read_db)):
+    return ShopService(session)
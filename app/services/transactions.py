@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from redis import asyncio as aioredis
+from redis.exceptions import LockError
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import SHOP_LIST_TAG, invalidate_tags
+from app.core.settings import settings
+from app.database.database import session_fabric
+from app.models import ShopItem, Transaction
+from app.models.transaction import TransactionStatus
+
+logger = logging.getLogger(__name__)
+
+SWEEPER_LOCK = "books-shop:lock:transaction-sweeper"
+
+
+async def expire_stale_transactions(session: AsyncSession, older_than: datetime, batch_size: int) -> int:
+    # SKIP LOCKED пропускает строки, которые прямо сейчас оплачиваются
+    stale_ids = (
+        select(Transaction.id)
+        .where(
+            Transaction.status == TransactionStatus.PENDING,
+            Transaction.created_at < older_than,
+        )
+        .order_by(Transaction.created_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    result = await session.execute(
+        update(Transaction)
+        .where(Transaction.id.in_(stale_ids.scalar_subquery()))
+        .values(status=TransactionStatus.EXPIRED)
+        .returning(Transaction.shop_item_id)
+        .execution_options(synchronize_session=False)
+    )
+    released = Counter(result.scalars().all())
+    if released:
+        shop_items = ShopItem.__table__
+        await session.execute(
+            update(shop_items)
+            .where(shop_items.c.id == bindparam("item_id"))
+            .values(
+                stock=shop_items.c.stock + bindparam("released"),
+                version=shop_items.c.version + 1,
+            ),
+            [{"item_id": item_id, "released": count} for item_id, count in released.items()],
+        )
+    await session.commit()
+    return sum(released.values())
+
+
+async def sweep_transactions(redis: aioredis.Redis) -> int:
+    lock = redis.lock(SWEEPER_LOCK, timeout=settings.SWEEPER_INTERVAL_SECONDS, blocking=False)
+    if not await lock.acquire():
+        return 0
+    expired = 0
+    try:
+        older_than = datetime.now(timezone.utc) - timedelta(minutes=settings.TRANSACTION_TTL_MINUTES)
+        while True:
+            async with session_fabric() as session:
+                batch = await expire_stale_transactions(session, older_than, settings.SWEEPER_BATCH_SIZE)
+            expired += batch
+            if batch < settings.SWEEPER_BATCH_SIZE:
+                break
+    finally:
+        try:
+            await lock.release()
+        except LockError:
+            pass
+    if expired:
+        logger.info("Просрочено транзакций: %s", expired)
+        await invalidate_tags(SHOP_LIST_TAG)
+    return expired
+
+
+async def run_transaction_sweeper(redis: aioredis.Redis) -> None:
+    while True:
+        try:
+            await sweep_transactions(redis)
+        except Exception:
+            logger.exception("Ошибка при просрочке транзакций")
+        await asyncio.sleep(settings.SWEEPER_INTERVAL_SECONDS)
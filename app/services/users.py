@@ -1,8 +1,11 @@
 from fastapi import Depends
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.dependencies import get_db
+from app.core.cache import USERS_LIST_TAG, invalidate_tags
+from app.core.dependencies import get_db, get_read_db
+from app.core.principal import load_principal
+from app.database.database import session_fabric
 from app.database.repository import BaseRepository
 from app.schemas.auth import JWTPayload, UserTokens, RefreshTokenRequest
 from app.schemas.user import UserRegister, UserCredentials
@@ -14,11 +17,13 @@ from app.services.exceptions import (
     WrongTokenType,
 )
 from app.utils.utils import (
-    hash_password,
-    verify_password,
+    hash_password_async,
+    verify_password_async,
     create_access_token,
     create_refresh_token,
     decode_jwt_token,
+    password_needs_rehash,
+    spawn,
 )
 
 
@@ -41,11 +46,12 @@ class UserService(BaseRepository):
                 f"Пользователь с ником {body.username} уже существует."
             )
         new_user = User(
-            **body.model_dump(), hashed_password=hash_password(body.password)
+            **body.model_dump(), hashed_password=await hash_password_async(body.password)
         )
         self.session.add(new_user)
         await self.session.commit()
         await self.session.refresh(new_user)
+        await invalidate_tags(USERS_LIST_TAG)
         return new_user
 
     async def login_exist_user(self, body: UserCredentials) -> UserTokens:
@@ -53,24 +59,50 @@ class UserService(BaseRepository):
             select(User).where(User.username == body.username)
         )
         user = result.scalar_one_or_none()
-        if user is None or not verify_password(body.password, user.hashed_password):
+        if user is None or not await verify_password_async(body.password, user.hashed_password):
             raise AuthError("Неправильное имя пользователя или пароль")
-        access_token = create_access_token(JWTPayload(uid=user.id))
+        if password_needs_rehash(user.hashed_password):
+            spawn(rehash_user_password(user.id, body.password, user.hashed_password))
+        return self.issue_tokens(user)
+
+    @staticmethod
+    def issue_tokens(user: User) -> UserTokens:
+        access_token = create_access_token(JWTPayload(uid=user.id, role=user.role.value))
         refresh_token = create_refresh_token(JWTPayload(uid=user.id))
         return UserTokens(access_token=access_token, refresh_token=refresh_token)
 
-    @staticmethod
-    def refresh_access_token(body: RefreshTokenRequest) -> UserTokens:
+    async def refresh_access_token(self, body: RefreshTokenRequest) -> UserTokens:
         payload = decode_jwt_token(body.refresh_token)
         if payload["token_type"] != "refresh":
             raise WrongTokenType("Неправильный тип токена")
-        new_access_token = create_access_token(JWTPayload(uid=int(payload["uid"])))
+        # те же claims, что в issue_tokens: без role require_admin уходил бы
+        # мимо TRUST_TOKEN_ROLE; роль актуальная, а не из старого refresh-токена
+        principal = await load_principal(self.session, int(payload["uid"]))
+        if principal is None:
+            raise AuthError("Пользователь не найден")
+        new_access_token = create_access_token(JWTPayload(uid=principal.id, role=principal.role.value))
         return UserTokens(
             access_token=new_access_token, refresh_token=body.refresh_token
         )
 
 
+async def rehash_user_password(user_id: int, password: str, old_hash: str) -> None:
+    # запрос уже завершён, поэтому своя сессия; old_hash защищает от гонки со сменой пароля
+    new_hash = await hash_password_async(password)
+    async with session_fabric() as session:
+        await session.execute(
+            update(User)
+            .where(User.id == user_id, User.hashed_password == old_hash)
+            .values(hashed_password=new_hash)
+        )
+        await session.commit()
+
+
 def get_users_service(session: AsyncSession = Depends(get_db)):
     return UserService(session)
 
 
+def get_users_read_service(session: AsyncSession = Depends(get_read_db)):
+    return UserService(session)
+
+
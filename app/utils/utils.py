@@ -1,16 +1,39 @@
+import asyncio
+import base64
+import json
+import logging
+import math
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timezone
 import bcrypt
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy import select, func
+from sqlalchemy import BigInteger, Float, Integer, Numeric, String, select, func, tuple_, literal
 from sqlalchemy.ext.asyncio import AsyncSession
 import jwt
 from app.auth.auth import auth
+from app.core.cache import get_cache_backend
+from app.core.responses import dump_json
+from app.core.settings import settings
 from app.schemas.auth import JWTPayload
+from app.schemas.batch import BatchResponse
 from app.schemas.pagination import PaginatedResponse
-from app.services.exceptions import TokenExpired, InvalidToken, NotFoundError
+from app.services.exceptions import TokenExpired, InvalidToken, NotFoundError, InvalidCursor
+
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login/")
 
+_background_tasks: set[asyncio.Task] = set()
+
+
+def spawn(coro) -> asyncio.Task:
+    # держим ссылку на задачу, иначе сборщик мусора может её прервать
+    task = asyncio.get_running_loop().create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
 
 def create_jwt_token(payload: JWTPayload) -> str:
     now = datetime.now(timezone.utc)
@@ -47,7 +70,7 @@ def create_refresh_token(payload: JWTPayload) -> str:
 
 
 def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     pwd_bytes: bytes = password.encode()
     return bcrypt.hashpw(pwd_bytes, salt).decode()
 
@@ -59,6 +82,114 @@ def verify_password(password: str, hashed_password: str) -> bool:
         return False
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    # хеш bcrypt имеет вид $2b$<cost>$<salt+hash>
+    try:
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+# bcrypt занимает ядро на 100-300 мс, поэтому в обработчиках он выполняется
+# в отдельном пуле, а число одновременных вызовов ограничено семафором
+_password_pool: Executor | None = None
+_password_semaphore: asyncio.Semaphore | None = None
+password_hash_stats = {
+    "calls": 0,
+    "in_flight": 0,
+    "queue_seconds_total": 0.0,
+    "queue_seconds_max": 0.0,
+    "run_seconds_total": 0.0,
+}
+
+
+def _run_timed(func, *args):
+    started = time.monotonic()
+    result = func(*args)
+    return result, started, time.monotonic()
+
+
+async def _run_in_password_pool(func, *args):
+    global _password_pool, _password_semaphore
+    if _password_pool is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _password_pool = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            _password_pool = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+            )
+        _password_semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_CONCURRENCY)
+
+    submitted = time.monotonic()
+    password_hash_stats["in_flight"] += 1
+    try:
+        async with _password_semaphore:
+            loop = asyncio.get_running_loop()
+            result, started, finished = await loop.run_in_executor(
+                _password_pool, _run_timed, func, *args
+            )
+    finally:
+        password_hash_stats["in_flight"] -= 1
+    queued = started - submitted
+    password_hash_stats["calls"] += 1
+    password_hash_stats["queue_seconds_total"] += queued
+    password_hash_stats["queue_seconds_max"] = max(password_hash_stats["queue_seconds_max"], queued)
+    password_hash_stats["run_seconds_total"] += finished - started
+    return result
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_password_pool(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    return await _run_in_password_pool(verify_password, password, hashed_password)
+
+
+def shutdown_password_pool() -> None:
+    global _password_pool, _password_semaphore
+    if _password_pool is not None:
+        _password_pool.shutdown(wait=False, cancel_futures=True)
+        _password_pool = _password_semaphore = None
+
+
+def encode_cursor(values: tuple) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+INT4_MAX = 2**31 - 1
+
+
+def _cursor_value_valid(value, column) -> bool:
+    # курсор приходит от клиента: значение неподходящего типа иначе дошло бы до asyncpg
+    column_type = column.type
+    if isinstance(value, bool):
+        return False
+    if isinstance(column_type, Integer):
+        if not isinstance(value, int):
+            return False
+        return isinstance(column_type, BigInteger) or -INT4_MAX - 1 <= value <= INT4_MAX
+    if isinstance(column_type, (Float, Numeric)):
+        return isinstance(value, (int, float)) and math.isfinite(value)
+    if isinstance(column_type, String):
+        return isinstance(value, str)
+    return True
+
+
+def decode_cursor(cursor: str, sort_keys) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise InvalidCursor(f"Некорректный курсор {cursor}")
+    if not isinstance(values, list) or len(values) != len(sort_keys):
+        raise InvalidCursor(f"Некорректный курсор {cursor}")
+    if not all(_cursor_value_valid(value, column) for value, column in zip(values, sort_keys)):
+        raise InvalidCursor(f"Некорректный курсор {cursor}")
+    return values
+
+
 async def paginate(
     session: AsyncSession,
     stmt,
@@ -67,33 +198,123 @@ async def paginate(
     count_stmt=None,
     row_mapper=None,
     use_scalars: bool = False,
+    cursor: str | None = None,
+    sort_keys=None,
+    cursor_getter=None,
+    descending: bool = False,
+    with_total: bool = True,
+    allow_empty: bool = False,
 ) -> PaginatedResponse:
-    if count_stmt is None:
-        count_stmt = select(func.count()).select_from(stmt.subquery())
+    # sort_keys должны совпадать с ORDER BY в stmt, последним идёт id
+    total = total_pages = None
+    if with_total:
+        if count_stmt is None:
+            count_stmt = select(func.count()).select_from(stmt.subquery())
+        count_result = await session.execute(count_stmt)
+        total = count_result.scalar()
+        total_pages = (total + page_size - 1) // page_size if total > 0 else 0
 
-    count_result = await session.execute(count_stmt)
-    total = count_result.scalar()
-    total_pages = (total + page_size - 1) // page_size if total > 0 else 0
+        if cursor is None and page > total_pages > 0:
+            raise NotFoundError(f"Страница {page} не существует")
 
-    if page > total_pages > 0:
-        raise NotFoundError(f"Страница {page} не существует")
+    if cursor is not None:
+        if not sort_keys:
+            raise InvalidCursor("Курсорная пагинация не поддерживается")
+        values = decode_cursor(cursor, sort_keys)
+        key = tuple_(*sort_keys)
+        last = tuple_(*[literal(v, col.type) for col, v in zip(sort_keys, values)])
+        stmt = stmt.where(key < last if descending else key > last)
+    else:
+        stmt = stmt.offset((page - 1) * page_size)
 
-    offset = (page - 1) * page_size
-    result = await session.execute(stmt.offset(offset).limit(page_size))
+    # лишняя строка показывает, есть ли следующая страница
+    result = await session.execute(stmt.limit(page_size + 1))
+    rows = result.scalars().all() if use_scalars else result.all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    items = [row_mapper(row) for row in rows] if row_mapper else list(rows)
 
-    if row_mapper:
-        rows = result.scalars().all() if use_scalars else result.all()
-        items = [row_mapper(row) for row in rows]
-
-    if not items:
+    if not items and not allow_empty:
         raise NotFoundError("Записи не найдены")
 
+    next_cursor = None
+    if has_more and cursor_getter is not None:
+        next_cursor = encode_cursor(cursor_getter(rows[-1]))
+
     return PaginatedResponse(
         items=items,
         total=total,
         page=page,
         page_size=page_size,
         total_pages=total_pages,
+        next_cursor=next_cursor,
+    )
+
+
+async def cached_json(key_for, load, tags: list[str] | None = None) -> bytes:
+    # тело ответа целиком из кэша; без Redis или при его ошибке — из базы
+    backend = get_cache_backend()
+    key = key_for(backend.prefix) if backend is not None else None
+    marks = None
+    if key is not None:
+        try:
+            body = await backend.get(key)
+            if body is not None:
+                return body
+            marks = await backend.tag_marks(tags if tags is not None else [backend.key_tag(key)])
+        except Exception:
+            logger.warning("Не удалось прочитать %s из кэша", key, exc_info=True)
+
+    body = dump_json(await load())
+    if key is not None:
+        try:
+            await backend.set(key, body, settings.CACHE_TTL, tags=tags, marks=marks)
+        except Exception:
+            logger.warning("Не удалось сохранить %s в кэш", key, exc_info=True)
+    return body
+
+
+async def fetch_batch(ids: list[int], key_for, load, schema, tags_for) -> BatchResponse:
+    # попадания в кэш одним MGET, промахи одним запросом в базу, порядок как в запросе
+    unique_ids = list(dict.fromkeys(ids))
+    found = {}
+    backend = get_cache_backend()
+    if backend is not None:
+        keys = [key_for(backend.prefix, id) for id in unique_ids]
+        try:
+            cached = await backend.get_many(keys)
+        except Exception:
+            logger.warning("Не удалось прочитать пачку из кэша", exc_info=True)
+            cached = [None] * len(keys)
+        for id, value in zip(unique_ids, cached):
+            if value is not None:
+                found[id] = schema.model_validate_json(value)
+
+    missing = [id for id in unique_ids if id not in found]
+    if missing:
+        marks = None
+        if backend is not None:
+            # метки читаются до загрузки: инвалидация во время запроса в базу отменит запись
+            tags = list(dict.fromkeys(tag for id in missing for tag in tags_for(id)))
+            try:
+                marks = dict(zip(tags, await backend.tag_marks(tags)))
+            except Exception:
+                logger.warning("Не удалось прочитать метки инвалидации", exc_info=True)
+        loaded = await load(missing)
+        found.update(loaded)
+        if marks is not None and loaded:
+            entries = [
+                (key_for(backend.prefix, id), item.model_dump_json().encode(), tags_for(id))
+                for id, item in loaded.items()
+            ]
+            try:
+                await backend.set_many(entries, settings.CACHE_TTL, marks=marks)
+            except Exception:
+                logger.warning("Не удалось сохранить пачку в кэш", exc_info=True)
+
+    return BatchResponse(
+        items=[found.get(id) for id in ids],
+        not_found=[id for id in unique_ids if id not in found],
     )
 
 
@@ -0,0 +1,38 @@
+"""Сколько хешей bcrypt в секунду даёт каждый cost на этой машине.
+
+    python benchmarks/bcrypt_cost.py --min-cost 8 --max-cost 14
+"""
+import argparse
+import time
+
+import bcrypt
+
+
+def measure(cost: int, seconds: float) -> float:
+    password = b"benchmark-password"
+    salt = bcrypt.gensalt(rounds=cost)
+    count = 0
+    started = time.perf_counter()
+    while True:
+        bcrypt.hashpw(password, salt)
+        count += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--min-cost", type=int, default=8)
+    parser.add_argument("--max-cost", type=int, default=14)
+    parser.add_argument("--seconds", type=float, default=2.0, help="время замера на один cost")
+    args = parser.parse_args()
+
+    print(f"{'cost':>4}  {'hash/s':>10}  {'ms/hash':>9}")
+    for cost in range(args.min_cost, args.max_cost + 1):
+        rate = measure(cost, args.seconds)
+        print(f"{cost:>4}  {rate:>10.2f}  {1000 / rate:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Микробенчмарки горячих путей без Postgres и Redis.
+
+Пагинация (сессия подменена заглушкой с готовыми строками), маппинг строк в
+схемы, сериализация страниц, JWT, ключи кэша и switch_layout. Результаты
+пишутся в JSON, чтобы сравнивать коммиты между собой:
+
+    PYTHONPATH=. python benchmarks/hot_paths.py
+    PYTHONPATH=. python benchmarks/hot_paths.py --compare benchmarks/results/<commit>.json
+    PYTHONPATH=. python benchmarks/hot_paths.py --only serialize --rounds 10
+    PYTHONPATH=. python benchmarks/hot_paths.py --only list_response  # прежний путь против orjson
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+for name, value in {
+    "SECRET_KEY": "benchmark-secret-key-for-hot-path-suite",
+    "DATABASE_USER": "benchmark",
+    "DATABASE_PASSWORD": "benchmark",
+    "DATABASE_HOST": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_SCHEMA": "postgresql+asyncpg",
+    "DATABASE_NAME": "benchmark",
+    "REDIS_URL": "redis://localhost:6379",
+}.items():
+    os.environ.setdefault(name, value)
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import Response  # noqa: E402
+
+from app.core.cache import RedisCache  # noqa: E402
+from app.core.responses import paginated_response  # noqa: E402
+from app.models import Book, ShopItem  # noqa: E402
+from app.models.user import UserRole  # noqa: E402
+from app.schemas.auth import JWTPayload  # noqa: E402
+from app.schemas.book import BookResponse  # noqa: E402
+from app.schemas.pagination import PaginatedParams, PaginatedResponse  # noqa: E402
+from app.schemas.shop import ShopItemResponse  # noqa: E402
+from app.services.books import BooksService  # noqa: E402
+from app.services.shop import ShopService  # noqa: E402
+from app.utils.utils import (  # noqa: E402
+    create_access_token,
+    decode_jwt_token,
+    encode_cursor,
+    paginate,
+    switch_layout,
+)
+
+PAGE_SIZES = (10, 25, 50, 100)
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def make_books(count: int) -> list[Book]:
+    return [
+        Book(
+            id=i,
+            title=f"Книга номер {i}",
+            author=f"Автор {i % 997}",
+            year=1800 + i % 220,
+            rating_sum=float(i % 50),
+            reviews_count=i % 13,
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def make_shop_items(books: list[Book]) -> list[ShopItem]:
+    return [
+        ShopItem(id=book.id, book_id=book.id, book=book, price=100.0 + book.id % 900, stock=book.id % 7)
+        for book in books
+    ]
+
+
+class _Scalars:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class _Result:
+    def __init__(self, rows=None, scalar=None):
+        self.rows = rows
+        self.value = scalar
+
+    def scalar(self):
+        return self.value
+
+    def scalars(self):
+        return _Scalars(self.rows)
+
+    def all(self):
+        return self.rows
+
+
+class RowsSession:
+    """Отдаёт заранее собранные строки: меряем только Python-часть paginate."""
+
+    def __init__(self, rows: list):
+        self.rows = rows
+
+    async def execute(self, stmt, *args, **kwargs):
+        if stmt._limit_clause is None:
+            return _Result(scalar=len(self.rows) * 10)
+        return _Result(rows=self.rows)
+
+
+def make_request(path: str, query: str, path_params: dict | None = None) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": query.encode(),
+            "headers": [],
+            "path_params": path_params or {},
+        }
+    )
+
+
+def build_cases() -> dict:
+    books = make_books(10_000)
+    items = make_shop_items(books)
+    cases = {}
+
+    for size in PAGE_SIZES:
+        page = books[: size + 1]
+        session = RowsSession(page)
+        stmt = select(Book).order_by(Book.id)
+
+        async def offset_page(session=session, stmt=stmt, size=size):
+            await paginate(
+                session, stmt, page=2, page_size=size,
+                row_mapper=BooksService.book_row_mapper, use_scalars=True,
+            )
+
+        async def cursor_page(session=session, stmt=stmt, size=size):
+            await paginate(
+                session, stmt, page=1, page_size=size,
+                row_mapper=BooksService.book_row_mapper, use_scalars=True,
+                cursor=encode_cursor((size,)), sort_keys=[Book.id],
+                cursor_getter=lambda book: (book.id,), with_total=False,
+            )
+
+        cases[f"paginate.offset.page_size={size}"] = offset_page
+        cases[f"paginate.cursor.page_size={size}"] = cursor_page
+
+    cases["row_mapper.book.rows=10000"] = lambda: [BooksService.book_row_mapper(b) for b in books]
+    cases["row_mapper.shop.rows=10000"] = lambda: [ShopService.shop_row_mapper(i) for i in items]
+
+    for size in PAGE_SIZES:
+        book_page = PaginatedResponse[BookResponse](
+            items=[BooksService.book_row_mapper(b) for b in books[:size]],
+            total=len(books), page=1, page_size=size, total_pages=len(books) // size,
+        )
+        shop_page = PaginatedResponse[ShopItemResponse](
+            items=[ShopService.shop_row_mapper(i) for i in items[:size]],
+            total=len(items), page=1, page_size=size, total_pages=len(items) // size,
+        )
+        cases[f"serialize.books.model_dump_json.page_size={size}"] = book_page.model_dump_json
+        cases[f"serialize.books.json_dumps.page_size={size}"] = (
+            lambda page=book_page: json.dumps(page.model_dump(mode="json"), ensure_ascii=False)
+        )
+        cases[f"serialize.shop.model_dump_json.page_size={size}"] = shop_page.model_dump_json
+        cases[f"serialize.shop.json_dumps.page_size={size}"] = (
+            lambda page=shop_page: json.dumps(page.model_dump(mode="json"), ensure_ascii=False)
+        )
+
+    # список целиком, как его отдаёт роут: строки -> схема -> JSON.
+    # validated — прежний путь (model_validate на строку + валидация response_model
+    # и dump_json в FastAPI), fast — dict из строк и orjson без повторной валидации
+    page_adapter = TypeAdapter(PaginatedResponse)
+    for size in PAGE_SIZES:
+        rows, shop_rows = books[:size], items[:size]
+
+        def validated_books(rows=rows, size=size):
+            page = PaginatedResponse(
+                items=[BooksService.book_row_mapper(b) for b in rows], total=len(books), page=1, page_size=size,
+            )
+            return page_adapter.dump_json(page_adapter.validate_python(page))
+
+        def fast_books(rows=rows, size=size):
+            page = PaginatedResponse(
+                items=[BooksService.book_row_dict(b) for b in rows], total=len(books), page=1, page_size=size,
+            )
+            return paginated_response(page).body
+
+        def validated_shop(rows=shop_rows, size=size):
+            page = PaginatedResponse(
+                items=[ShopService.shop_row_mapper(i) for i in rows], total=len(items), page=1, page_size=size,
+            )
+            return page_adapter.dump_json(page_adapter.validate_python(page))
+
+        def fast_shop(rows=shop_rows, size=size):
+            page = PaginatedResponse(
+                items=[ShopService.shop_row_dict(i) for i in rows], total=len(items), page=1, page_size=size,
+            )
+            return paginated_response(page).body
+
+        cases[f"list_response.books.validated.page_size={size}"] = validated_books
+        cases[f"list_response.books.fast.page_size={size}"] = fast_books
+        cases[f"list_response.shop.validated.page_size={size}"] = validated_shop
+        cases[f"list_response.shop.fast.page_size={size}"] = fast_shop
+
+    payload = JWTPayload(uid=42, role=UserRole.USER.value)
+    token = create_access_token(payload)
+    cases["jwt.create_access_token"] = lambda: create_access_token(payload)
+    cases["jwt.decode_jwt_token"] = lambda: decode_jwt_token(token)
+
+    list_request = make_request("/books/", "page=3&page_size=25")
+    book_request = make_request("/books/17", "", {"book_id": 17})
+    list_kwargs = {"params": PaginatedParams(page=3, page_size=25)}
+    response = Response()
+    cases["cache.key_builder.list"] = lambda: RedisCache.custom_key_builder(
+        None, "books:list", request=list_request, response=response, kwargs=list_kwargs
+    )
+    cases["cache.key_builder.book"] = lambda: RedisCache.custom_key_builder(
+        None, "book:{book_id}", request=book_request, response=response, kwargs={"book_id": 17}
+    )
+
+    cases["switch_layout.short"] = lambda: switch_layout("ghbdtn")
+    cases["switch_layout.long"] = lambda: switch_layout("Djqyf b vbh " * 8)
+    return cases
+
+
+def measure(fn, rounds: int, min_round_time: float) -> dict:
+    is_async = asyncio.iscoroutinefunction(fn)
+    loop = asyncio.new_event_loop() if is_async else None
+
+    def run(number: int) -> float:
+        if is_async:
+            async def batch():
+                for _ in range(number):
+                    await fn()
+
+            started = time.perf_counter()
+            loop.run_until_complete(batch())
+        else:
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+        return time.perf_counter() - started
+
+    # подбираем число вызовов, чтобы раунд длился хотя бы min_round_time
+    number = 1
+    while (elapsed := run(number)) < min_round_time:
+        number *= 10 if elapsed < min_round_time / 10 else 2
+    timings = [run(number) / number for _ in range(rounds)]
+    if loop is not None:
+        loop.close()
+    return {
+        "min_us": round(min(timings) * 1e6, 3),
+        "median_us": round(statistics.median(timings) * 1e6, 3),
+        "ops_per_sec": round(1 / min(timings), 1),
+        "calls_per_round": number,
+        "rounds": rounds,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results: dict, baseline: dict | None) -> None:
+    width = max(len(name) for name in results)
+    header = f"{'бенчмарк':<{width}}  {'min, мкс':>12}  {'median, мкс':>12}"
+    print(header + (f"  {'было, мкс':>12}  {'изм.':>8}" if baseline else ""))
+    for name, result in results.items():
+        line = f"{name:<{width}}  {result['min_us']:>12.3f}  {result['median_us']:>12.3f}"
+        before = (baseline or {}).get(name)
+        if before:
+            change = (result["min_us"] - before["min_us"]) / before["min_us"] * 100
+            line += f"  {before['min_us']:>12.3f}  {change:>+7.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-round-time", type=float, default=0.1, help="секунд на раунд")
+    parser.add_argument("--only", default=None, help="подстрока в имени бенчмарка")
+    parser.add_argument("--output", default=None, help="по умолчанию benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", default=None, help="JSON предыдущего прогона")
+    args = parser.parse_args()
+
+    cases = {
+        name: fn for name, fn in build_cases().items() if args.only is None or args.only in name
+    }
+    results = {name: measure(fn, args.rounds, args.min_round_time) for name, fn in cases.items()}
+
+    commit = git_commit()
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(
+            {
+                "commit": commit,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results,
+            },
+            ensure_ascii=False,
+            indent=2,
+        )
+    )
+
+    baseline = json.loads(Path(args.compare).read_text())["results"] if args.compare else None
+    print_results(results, baseline)
+    print(f"\nрезультаты: {output}")
+
+
+if __name__ == "__main__":
+    main()
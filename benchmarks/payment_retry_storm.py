@@ -0,0 +1,128 @@
+"""Шторм повторов подтверждения оплаты.
+
+Одну транзакцию подтверждают много раз параллельно, как при повторах клиента и
+дублях вебхуков. Redis — локальный стенд (fakeredis) или настоящий через
+--redis-url. Postgres заменён счётчиком, который повторяет семантику условного
+UPDATE ... WHERE status = 'PENDING': так видно, сколько запросов дошло до базы
+и что переход в COMPLETED случился ровно один раз.
+
+    PYTHONPATH=. python benchmarks/payment_retry_storm.py --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+for name, value in {
+    "SECRET_KEY": "benchmark",
+    "DATABASE_USER": "benchmark",
+    "DATABASE_PASSWORD": "benchmark",
+    "DATABASE_HOST": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_SCHEMA": "postgresql+asyncpg",
+    "DATABASE_NAME": "benchmark",
+    "REDIS_URL": "redis://localhost:6379",
+}.items():
+    os.environ.setdefault(name, value)
+
+from fastapi_cache import FastAPICache  # noqa: E402
+from redis import asyncio as aioredis  # noqa: E402
+
+from app.core.cache import LRUCache, TwoTierBackend  # noqa: E402
+from app.models import Transaction  # noqa: E402
+from app.models.transaction import TransactionStatus  # noqa: E402
+from app.services.shop import ShopService  # noqa: E402
+
+
+class _Result:
+    def __init__(self, row):
+        self.row = row
+
+    def scalar_one_or_none(self):
+        return self.row
+
+
+class CountingSession:
+    def __init__(self, transaction: Transaction):
+        self.transaction = transaction
+        self.calls = 0
+        self.completions = 0
+
+    async def execute(self, stmt, *args, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.001)
+        if self.transaction.status != TransactionStatus.PENDING:
+            return _Result(None)
+        self.transaction.status = TransactionStatus.COMPLETED
+        self.completions += 1
+        return _Result(self.transaction)
+
+    async def scalar(self, stmt, *args, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.001)
+        return self.transaction
+
+    async def commit(self):
+        pass
+
+
+def make_redis(url: str | None):
+    if url:
+        return aioredis.from_url(url)
+    try:
+        import fakeredis
+    except ImportError:
+        raise SystemExit("нужен fakeredis (pip install fakeredis) или --redis-url")
+    return fakeredis.aioredis.FakeRedis()
+
+
+async def run(requests: int, concurrency: int, redis_url: str | None, l1_size: int) -> None:
+    redis = make_redis(redis_url)
+    backend = TwoTierBackend(redis, LRUCache(l1_size, 60), prefix=f"bench-{uuid.uuid4().hex[:6]}")
+    FastAPICache.init(backend, prefix=backend.prefix)
+
+    key = str(uuid.uuid4())
+    session = CountingSession(
+        Transaction(
+            id=1,
+            idempotence_key=key,
+            shop_item_id=1,
+            user_id=1,
+            amount=100.0,
+            status=TransactionStatus.PENDING,
+        )
+    )
+    service = ShopService(session)
+    gate = asyncio.Semaphore(concurrency)
+    statuses = set()
+
+    async def confirm() -> None:
+        async with gate:
+            statuses.add((await service.confirm_payment(key)).status)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[confirm() for _ in range(requests)])
+    elapsed = time.perf_counter() - started
+
+    print(f"запросов: {requests}, параллельно: {concurrency}, L1: {l1_size}")
+    print(f"время: {elapsed:.3f} с, {requests / elapsed:.0f} подтверждений/с")
+    print(f"обращений к базе: {session.calls}, переходов в COMPLETED: {session.completions}")
+    print(f"статистика кэша: {backend.stats}")
+    await redis.close()
+    if session.completions != 1 or statuses != {TransactionStatus.COMPLETED}:
+        raise SystemExit("ОШИБКА: оплата подтверждена не ровно один раз")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--redis-url", default=None, help="по умолчанию fakeredis в памяти")
+    parser.add_argument("--l1-size", type=int, default=0, help="0 — каждый повтор идёт в Redis")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.redis_url, args.l1_size))
+
+
+if __name__ == "__main__":
+    main()
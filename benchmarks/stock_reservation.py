@@ -0,0 +1,101 @@
+"""Флеш-распродажа: сотни покупателей одновременно берут один товар.
+
+Нужна база с применёнными миграциями (настройки берутся из .env). Скрипт создаёт
+временные книгу, товар и пользователей, запускает покупки параллельно, проверяет
+отсутствие overselling и удаляет созданные данные.
+
+    PYTHONPATH=. python benchmarks/stock_reservation.py --buyers 500 --stock 100
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.settings import settings
+from app.models import Book, ShopItem, Transaction, User
+from app.services.exceptions import AlreadyExistsError, OutOfStockError
+from app.services.shop import ShopService
+
+
+async def run(buyers: int, stock: int, concurrency: int) -> None:
+    engine = create_async_engine(settings.DATABASE_URL, pool_size=concurrency, max_overflow=0)
+    sessions = async_sessionmaker(bind=engine, expire_on_commit=False)
+    run_id = uuid.uuid4().hex[:8]
+
+    async with sessions() as session:
+        book = Book(title=f"bench-{run_id}", author="benchmark")
+        session.add(book)
+        await session.flush()
+        item = ShopItem(book_id=book.id, price=100, stock=stock)
+        users = [
+            User(
+                username=f"b{run_id}{i:05d}",
+                password="benchmark",
+                hashed_password="-",
+                name="benchmark",
+            )
+            for i in range(buyers)
+        ]
+        session.add(item)
+        session.add_all(users)
+        await session.commit()
+        item_id, book_id, user_ids = item.id, book.id, [user.id for user in users]
+
+    outcomes = {"reserved": 0, "out_of_stock": 0, "duplicate": 0}
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def buy(user_id: int) -> None:
+        async with gate, sessions() as session:
+            started = time.perf_counter()
+            try:
+                await ShopService(session).create_item_purchase(item_id, user_id)
+                outcomes["reserved"] += 1
+            except OutOfStockError:
+                outcomes["out_of_stock"] += 1
+            except AlreadyExistsError:
+                outcomes["duplicate"] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[buy(user_id) for user_id in user_ids])
+    elapsed = time.perf_counter() - started
+
+    async with sessions() as session:
+        stock_left = await session.scalar(select(ShopItem.stock).where(ShopItem.id == item_id))
+        transactions = await session.scalar(
+            select(func.count()).select_from(Transaction).where(Transaction.shop_item_id == item_id)
+        )
+        await session.execute(delete(Book).where(Book.id == book_id))
+        await session.execute(delete(User).where(User.id.in_(user_ids)))
+        await session.commit()
+    await engine.dispose()
+
+    latencies.sort()
+    print(f"покупателей: {buyers}, stock: {stock}, параллельно: {concurrency}")
+    print(f"итоги: {outcomes}")
+    print(f"время: {elapsed:.3f} с, {buyers / elapsed:.1f} покупок/с")
+    print(f"латентность p50: {latencies[len(latencies) // 2] * 1000:.1f} мс, "
+          f"p99: {latencies[int(len(latencies) * 0.99)] * 1000:.1f} мс")
+    print(f"остаток: {stock_left}, транзакций: {transactions}")
+
+    oversold = outcomes["reserved"] > stock or stock_left < 0 or transactions != outcomes["reserved"]
+    if oversold or stock_left != stock - outcomes["reserved"]:
+        raise SystemExit("ОШИБКА: резерв и остаток не сходятся")
+    print("overselling нет")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--buyers", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.buyers, args.stock, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 #!/usr/bin/env bash
 set -e
 alembic upgrade head
-python seed.py
+python seed.py --if-empty
 exec uvicorn app.main:app --host 0.0.0.0 --port 8000
\ No newline at end of file
@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHUNK_SIZE = 1 << 16
+
+
+async def read_chunks(path: Path):
+    with path.open("rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+async def run(path: Path, fmt: str) -> int:
+    from app.database.database import session_fabric
+    from app.services.catalog_import import CatalogImportService
+
+    async with session_fabric() as session:
+        report = await CatalogImportService(session).import_catalog(read_chunks(path), fmt)
+    print(report.model_dump_json(indent=2))
+    return 1 if report.rows_failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Массовый импорт книг и товаров магазина")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default=None, help="по умолчанию по расширению файла")
+    args = parser.parse_args()
+    fmt = args.format or ("csv" if args.path.suffix.lower() == ".csv" else "ndjson")
+    sys.exit(asyncio.run(run(args.path, fmt)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,10 @@
+import argparse
 import asyncio
+import bisect
 import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy import select
 import os
@@ -238,5 +243,275 @@ async def seed():
         print("Seed завершён.")
 
 
+# --- синтетические данные ---
+
+TITLE_ADJECTIVES = [
+    "Тихий", "Последний", "Северный", "Забытый", "Белый", "Долгий", "Красный", "Старый",
+    "Ночной", "Горький", "Золотой", "Пустой", "Вечный", "Дальний", "Железный", "Светлый",
+]
+TITLE_NOUNS = [
+    "Дон", "сад", "берег", "город", "мост", "путь", "дом", "лес", "огонь", "ветер",
+    "остров", "полк", "маяк", "перевал", "вокзал", "караван", "архив", "сезон",
+]
+TITLE_TAILS = [
+    "", "", "", " и море", " над рекой", " в тумане", " без имени", " на краю света",
+    ": хроника", ". Книга вторая", " и другие рассказы",
+]
+AUTHOR_FIRST = ["Иван", "Анна", "Пётр", "Мария", "Лев", "Ольга", "Фёдор", "Вера", "Глеб", "Нина"]
+AUTHOR_LAST = [
+    "Соколов", "Лебедева", "Морозов", "Волкова", "Орлов", "Зайцева", "Крылов",
+    "Белова", "Громов", "Ветрова", "Тихонов", "Полякова",
+]
+SYNTHETIC_PASSWORD = "synthetic_pass"
+
+
+def asyncpg_dsn() -> str:
+    return (
+        f"postgresql://{os.getenv('DATABASE_USER')}:{os.getenv('DATABASE_PASSWORD')}@"
+        f"{os.getenv('DATABASE_HOST')}:{os.getenv('DATABASE_PORT')}/"
+        f"{os.getenv('DATABASE_NAME')}"
+    )
+
+
+def zipf_counts(total: int, n: int, s: float, cap: int, rng: random.Random) -> list[int]:
+    # число отзывов книги ~ 1 / rank^s; ранги перемешаны, чтобы популярные книги
+    # не шли подряд и не попадали в один диапазон
+    weights = [1 / rank ** s for rank in range(1, n + 1)]
+    norm = total / sum(weights)
+    counts = [min(cap, round(w * norm)) for w in weights]
+    rng.shuffle(counts)
+    return counts
+
+
+class SyntheticPlan:
+    def __init__(self, args, base: dict[str, int]):
+        self.args = args
+        self.base = base
+        rng = random.Random(f"{args.seed}:plan")
+        self.review_counts = (
+            zipf_counts(args.reviews, args.books, args.zipf_s, args.users, rng) if args.users else []
+        )
+        # смещения книг (от 0), у которых есть товар в магазине
+        self.shop_offsets = sorted(rng.sample(range(args.books), min(args.shop_items, args.books)))
+
+    def book_ranges(self):
+        step = self.args.chunk_size
+        return [(start, min(start + step, self.args.books)) for start in range(0, self.args.books, step)]
+
+
+def user_records(plan: SyntheticPlan, start: int, stop: int, hashed: str):
+    rng = random.Random(f"{plan.args.seed}:users:{start}")
+    for offset in range(start, stop):
+        user_id = plan.base["users"] + offset + 1
+        yield (
+            user_id,
+            f"synthetic_{user_id}",
+            SYNTHETIC_PASSWORD,
+            hashed,
+            "USER",
+            rng.choice(FAKE_USERS)["name"],
+            rng.randint(16, 75),
+        )
+
+
+def book_records(plan: SyntheticPlan, start: int, stop: int):
+    rng = random.Random(f"{plan.args.seed}:books:{start}")
+    for offset in range(start, stop):
+        title = f"{rng.choice(TITLE_ADJECTIVES)} {rng.choice(TITLE_NOUNS)}{rng.choice(TITLE_TAILS)}"
+        author = f"{rng.choice(AUTHOR_FIRST)} {rng.choice(AUTHOR_LAST)}"
+        # rating_sum и reviews_count заполнит триггер на reviews
+        yield plan.base["books"] + offset + 1, title[:128], author, rng.randint(1800, 2025), 0.0, 0
+
+
+def review_records(plan: SyntheticPlan, start: int, stop: int):
+    rng = random.Random(f"{plan.args.seed}:reviews:{start}")
+    review_id = plan.base["reviews"] + sum(plan.review_counts[:start])
+    for offset in range(start, stop):
+        count = plan.review_counts[offset]
+        if not count:
+            continue
+        book_id = plan.base["books"] + offset + 1
+        quality = rng.uniform(2.5, 4.8)
+        for user_offset in rng.sample(range(plan.args.users), count):
+            review_id += 1
+            rate = min(5.0, max(1.0, round(rng.gauss(quality, 0.7), 1)))
+            yield review_id, book_id, plan.base["users"] + user_offset + 1, rate, rng.choice(REVIEW_TEXTS)
+
+
+def shop_records(plan: SyntheticPlan, first: int, last: int):
+    rng = random.Random(f"{plan.args.seed}:shop:{first}")
+    for position in range(first, last):
+        book_id = plan.base["books"] + plan.shop_offsets[position] + 1
+        yield plan.base["shop_books"] + position + 1, book_id, round(rng.uniform(299, 1499), 2), rng.randint(0, 50)
+
+
+def transaction_records(plan: SyntheticPlan, first: int, last: int, prices: dict[int, float]):
+    args = plan.args
+    if first == last or not args.users:
+        return
+    rng = random.Random(f"{args.seed}:transactions:{first}")
+    # транзакции делятся между диапазонами пропорционально числу товаров
+    def share(position: int) -> int:
+        return args.transactions * position // len(plan.shop_offsets)
+
+    transaction_id = plan.base["transactions"] + share(first)
+    count = share(last) - share(first)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    for _ in range(count):
+        transaction_id += 1
+        shop_id = plan.base["shop_books"] + rng.randrange(first, last) + 1
+        # PENDING не генерируем: их снимает сборщик и ограничивает уникальный индекс
+        status = "COMPLETED" if rng.random() < 0.9 else "EXPIRED"
+        yield (
+            transaction_id,
+            str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            shop_id,
+            plan.base["users"] + rng.randrange(args.users) + 1,
+            prices[shop_id],
+            status,
+            now - timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+        )
+
+
+async def copy_users(pool, plan: SyntheticPlan, start: int, stop: int, hashed: str) -> None:
+    async with pool.acquire() as conn:
+        await conn.copy_records_to_table(
+            "users",
+            records=user_records(plan, start, stop, hashed),
+            columns=["id", "username", "password", "hashed_password", "role", "name", "age"],
+        )
+
+
+async def copy_book_range(pool, plan: SyntheticPlan, start: int, stop: int) -> None:
+    first = bisect.bisect_left(plan.shop_offsets, start)
+    last = bisect.bisect_left(plan.shop_offsets, stop)
+    shop = list(shop_records(plan, first, last))
+    async with pool.acquire() as conn, conn.transaction():
+        await conn.copy_records_to_table(
+            "books",
+            records=book_records(plan, start, stop),
+            columns=["id", "title", "author", "year", "rating_sum", "reviews_count"],
+        )
+        if shop:
+            await conn.copy_records_to_table(
+                "shop_books", records=shop, columns=["id", "book_id", "price", "stock"]
+            )
+        if plan.review_counts:
+            await conn.copy_records_to_table(
+                "reviews",
+                records=review_records(plan, start, stop),
+                columns=["id", "book_id", "user_id", "rate", "description"],
+            )
+        if plan.args.transactions and shop:
+            prices = {row[0]: row[2] for row in shop}
+            await conn.copy_records_to_table(
+                "transactions",
+                records=transaction_records(plan, first, last, prices),
+                columns=["id", "idempotence_key", "shop_item_id", "user_id", "amount", "status", "created_at"],
+            )
+    print(f"  книги {start + 1}-{stop}: готово")
+
+
+async def generate(args) -> None:
+    import asyncpg
+    from app.utils.utils import hash_password
+
+    pool = await asyncpg.create_pool(asyncpg_dsn(), min_size=1, max_size=args.workers)
+    try:
+        base = {}
+        for table in ("users", "books", "reviews", "shop_books", "transactions"):
+            base[table] = await pool.fetchval(f"SELECT coalesce(max(id), 0) FROM {table}")
+
+        plan = SyntheticPlan(args, base)
+        # один хеш на всех синтетических пользователей: bcrypt на миллион строк — часы
+        hashed = hash_password(SYNTHETIC_PASSWORD)
+        gate = asyncio.Semaphore(args.workers)
+
+        async def bounded(coro):
+            async with gate:
+                await coro
+
+        started = time.perf_counter()
+        step = args.chunk_size
+        await asyncio.gather(*[
+            bounded(copy_users(pool, plan, start, min(start + step, args.users), hashed))
+            for start in range(0, args.users, step)
+        ])
+        print(f"Добавлено пользователей: {args.users} (пароль {SYNTHETIC_PASSWORD})")
+
+        await asyncio.gather(*[
+            bounded(copy_book_range(pool, plan, start, stop)) for start, stop in plan.book_ranges()
+        ])
+        print(
+            f"Добавлено книг: {args.books}, товаров: {len(plan.shop_offsets)}, "
+            f"отзывов: {sum(plan.review_counts)}, "
+            f"транзакций: {args.transactions if plan.shop_offsets and args.users else 0}"
+        )
+
+        # id выданы явно — двигаем последовательности за максимум
+        for table in ("users", "books", "reviews", "shop_books", "transactions"):
+            await pool.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT coalesce(max(id), 1) FROM {table}))"
+            )
+            await pool.execute(f"ANALYZE {table}")
+
+        await pool.execute(
+            """
+            INSERT INTO users (username, password, hashed_password, role, name, age)
+            VALUES ($1, $2, $3, 'ADMIN', $4, $5)
+            ON CONFLICT (username) DO NOTHING
+            """,
+            ADMIN_USER["username"],
+            ADMIN_USER["password"],
+            hash_password(ADMIN_USER["password"]),
+            ADMIN_USER["name"],
+            ADMIN_USER["age"],
+        )
+        print(f"Генерация завершена за {time.perf_counter() - started:.1f} с")
+    finally:
+        await pool.close()
+
+
+async def database_is_empty() -> bool:
+    from app.models import Book
+
+    async with async_session() as session:
+        return (await session.execute(select(Book.id).limit(1))).first() is None
+
+
+async def main(args) -> None:
+    if args.if_empty and not await database_is_empty():
+        print("В базе уже есть данные, seed пропущен.")
+        return
+    if args.books:
+        await generate(args)
+    else:
+        await seed()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Без --books заливает фиксированный список классики, "
+                    "с --books — детерминированные синтетические данные через COPY."
+    )
+    parser.add_argument("--books", type=int, default=0)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--reviews", type=int, default=0, help="всего отзывов, по книгам по закону Ципфа")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="показатель перекоса распределения отзывов")
+    parser.add_argument("--shop-items", type=int, default=None, help="по умолчанию — по товару на каждую книгу")
+    parser.add_argument("--transactions", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=4, help="параллельных COPY")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="книг/пользователей на один COPY")
+    parser.add_argument("--if-empty", action="store_true", help="ничего не делать, если книги уже есть")
+    args = parser.parse_args()
+    if args.shop_items is None:
+        args.shop_items = args.books
+    if args.reviews and not args.users:
+        parser.error("для отзывов нужны пользователи (--users)")
+    return args
+
+
 if __name__ == "__main__":
-    asyncio.run(seed())
\ No newline at end of file
+    asyncio.run(main(parse_args()))
\ No newline at end of file
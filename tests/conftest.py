@@ -0,0 +1,14 @@
+import os
+
+# настройки читаются при импорте app.*: для тестов без Postgres и Redis хватит заглушек
+for name, value in {
+    "SECRET_KEY": "test-secret-key-for-unit-tests",
+    "DATABASE_USER": "test",
+    "DATABASE_PASSWORD": "test",
+    "DATABASE_HOST": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_SCHEMA": "postgresql+asyncpg",
+    "DATABASE_NAME": "test",
+    "REDIS_URL": "redis://localhost:6379",
+}.items():
+    os.environ.setdefault(name, value)
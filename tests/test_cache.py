@@ -0,0 +1,19 @@
+from redis.asyncio import Redis
+
+from app.api.routes.books import reviews_page
+from app.core.cache import BOOK_REVIEWS_NAMESPACE, CacheKeyBuilder, LRUCache, TwoTierBackend, book_reviews_tag
+from app.schemas.review import ReviewParams
+
+
+def test_key_without_request_formats_namespace_from_kwargs():
+    # так вызывает хелпер прогрев: без запроса, только с аргументами
+    backend = TwoTierBackend(Redis(), LRUCache(10, 5), "books-cache")
+
+    key = CacheKeyBuilder()(
+        reviews_page,
+        f"{backend.prefix}:{BOOK_REVIEWS_NAMESPACE}",
+        kwargs={"book_id": 7, "params": ReviewParams(), "service": object()},
+    )
+
+    assert key.startswith(f"books-cache:{book_reviews_tag(7)}:")
+    assert backend.key_tag(key) == book_reviews_tag(7)
@@ -0,0 +1,37 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.models.user import UserRole
+from app.schemas.auth import JWTPayload, RefreshTokenRequest
+from app.services.users import UserService
+from app.utils.utils import create_refresh_token, decode_jwt_token
+
+
+class _Result:
+    def __init__(self, row):
+        self.row = row
+
+    def one_or_none(self):
+        return self.row
+
+
+class UsersSession:
+    def __init__(self, row):
+        self.row = row
+
+    async def execute(self, stmt, *args, **kwargs):
+        return _Result(self.row)
+
+
+def test_refreshed_access_token_keeps_role():
+    user = SimpleNamespace(id=7, username="admin", role=UserRole.ADMIN)
+    refresh_token = create_refresh_token(JWTPayload(uid=user.id))
+
+    tokens = asyncio.run(
+        UserService(UsersSession(user)).refresh_access_token(RefreshTokenRequest(refresh_token=refresh_token))
+    )
+
+    payload = decode_jwt_token(tokens.access_token)
+    assert payload["token_type"] == "access"
+    assert payload["uid"] == user.id
+    assert payload["role"] == UserRole.ADMIN.value